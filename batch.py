@@ -0,0 +1,113 @@
+#	sympy-tax - Using sympy to compute tax as an equation
+#	Copyright (C) 2024  lxylxy123456
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Compute many households. Each worker process builds the model once per
+# (consts file, filing status) and evaluates input files with it.
+
+import argparse, multiprocessing, os, sys
+
+from fast import format_number
+from main import get_inputs
+from kernel import get_kernel
+from writers import WRITERS
+
+def list_tasks(paths, consts_file, filing_status):
+	# A path is either a directory of *.yml input files, or a manifest file
+	# with lines as "input_file [filing_status [consts_file]]". Relative paths
+	# in a manifest are relative to its directory.
+	for path in paths:
+		if os.path.isdir(path):
+			for i in sorted(os.listdir(path)):
+				if i.endswith(('.yml', '.yaml')):
+					yield os.path.join(path, i), filing_status, consts_file
+			continue
+		for line in open(path):
+			line = line.split('#', 1)[0].split()
+			if not line:
+				continue
+			assert len(line) <= 3, 'Invalid manifest line: %s' % line
+			input_file = os.path.join(os.path.dirname(path), line[0])
+			fs = line[1] if len(line) > 1 else filing_status
+			cf = consts_file
+			if len(line) > 2:
+				cf = os.path.join(os.path.dirname(path), line[2])
+			yield input_file, fs, cf
+
+def evaluate(task):
+	input_file, filing_status, consts_file, outputs = task
+	kernel = get_kernel(consts_file, filing_status, outputs)
+	columns = {k: [float(v)] for k, v in get_inputs(input_file).items()}
+	result = []
+	for k, (v, c) in kernel(columns).items():
+		result.append((k, float(v[0]) if c[0] else None))
+	return input_file, result
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument('paths', nargs='+',
+						help='directories of input files or manifest files')
+	parser.add_argument('-f', '--filing-status', default='single')
+	parser.add_argument('-c', '--consts-file', default='consts/2024.yml')
+	parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+						help='number of worker processes')
+	parser.add_argument('--chunk-size', type=int, default=1,
+						help='number of input files sent to a worker at once')
+	parser.add_argument('--outputs',
+						help='comma-separated equation names to compute')
+	parser.add_argument('--format', default='text',
+						choices=['text'] + list(WRITERS),
+						help='output format (default: %(default)s)')
+	parser.add_argument('-o', '--output',
+						help='output file (default: standard output)')
+	args = parser.parse_args()
+
+	outputs = None
+	if args.outputs:
+		outputs = tuple(args.outputs.split(','))
+	try:
+		get_kernel(args.consts_file, args.filing_status, outputs)
+	except ValueError as err:
+		parser.error(str(err))
+	tasks = ((*i, outputs) for i in
+			 list_tasks(args.paths, args.consts_file, args.filing_status))
+	if args.jobs <= 1:
+		results = map(evaluate, tasks)
+		pool = None
+	else:
+		pool = multiprocessing.Pool(args.jobs)
+		results = pool.imap_unordered(evaluate, tasks, args.chunk_size)
+	f = open(args.output, 'w', newline='') if args.output else sys.stdout
+	writer = None
+	if args.format != 'text':
+		writer = WRITERS[args.format](f)
+	for input_file, result in results:
+		if writer is not None:
+			for k, v in result:
+				writer.write(input_file, k, v, v is not None)
+			f.flush()
+			continue
+		print('#', input_file, file=f)
+		for k, v in result:
+			print(k, '=', format_number(v), file=f)
+		print(file=f, flush=True)
+	if args.output:
+		f.close()
+	if pool is not None:
+		pool.close()
+		pool.join()
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,198 @@
+#	sympy-tax - Using sympy to compute tax as an equation
+#	Copyright (C) 2024  lxylxy123456
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Benchmark suite. Synthetic households are generated from a fixed seed for
+# every filing status and consts file, and the timings are written to a JSON
+# file. The on-disk cache is disabled, so every model is built from scratch.
+
+import argparse, json, os, platform, random, statistics, sys, time
+
+os.environ['SYMPY_TAX_CACHE'] = ''
+
+import numpy
+import sympy
+
+import plot
+from kernel import compile_kernel
+from main import Equation, clear_consts_cache, compute_all
+
+FILING_STATUSES = ['single', 'mfj', 'hoh', 'mfs', 'qss']
+CONSTS_FILES = ['consts/2024.yml', 'consts/2025.yml']
+BENCHMARKS = ['build', 'fixed', 'symbolic_1', 'symbolic_2', 'symbolic_3',
+			  'symbolic_3_range', 'kernel', 'plot', 'batch']
+# Variable inputs of symbolic_1, symbolic_2 and symbolic_3.
+VARIABLE_INPUTS = ['v_f1040_1a', 'v_f1040sd_8a_d', 'v_f1040sb_6']
+# Input ranges of symbolic_3_range.
+INPUT_RANGES = {
+	'v_f1040_1a': (50000, 300000),
+	'v_f1040sd_8a_d': (0, 50000),
+	'v_f1040sb_6': (0, 20000),
+}
+
+def household(rng, filing_status):
+	# Return {'name': number} with the same lines as input.yml.
+	scale = 2 if filing_status in ('mfj', 'qss') else 1
+	wages = round(rng.lognormvariate(11.3, 0.6) * scale)
+	return {
+		'v_f1040_1a': wages,
+		'v_f1040_25a': round(wages * rng.uniform(0.1, 0.25)),
+		'v_ca540_12': wages,
+		'v_ca540_71': round(wages * rng.uniform(0.03, 0.08)),
+		'v_f1040sb_2': round(rng.expovariate(1 / 1000)),
+		'v_f1040_3a': round(rng.expovariate(1 / 3000)),
+		'v_f1040sb_6': round(rng.expovariate(1 / 3000)),
+		'v_f1040sd_1a_d': round(rng.gauss(2000, 5000)),
+		'v_f1040sd_1a_e': round(rng.expovariate(1 / 10)),
+		'v_f1040sd_8a_d': round(rng.gauss(5000, 10000)),
+		'v_f1040sd_8a_e': round(rng.expovariate(1 / 10)),
+		'v_f1040_16_qdcgtw_3_file_d': 1,
+	}
+
+def households(n, filing_status, seed):
+	rng = random.Random('%s-%s' % (seed, filing_status))
+	return [household(rng, filing_status) for _ in range(n)]
+
+def to_sympy(inputs):
+	return {k: sympy.core.numbers.Number(v) for k, v in inputs.items()}
+
+def build(consts_file, filing_status, variable_inputs=(), fixed_inputs=None,
+		  keep_references=False, input_ranges=None):
+	e = Equation()
+	e.set_variable_fixed_inputs(variable_inputs, fixed_inputs or {})
+	e.set_input_ranges(input_ranges or {})
+	e.set_keep_references(keep_references)
+	compute_all(e, consts_file, filing_status, filing_status)
+	return e
+
+def run_inline(e, inputs):
+	# Same as main() without --by-line.
+	values = e.inputs.copy()
+	for k, v in inputs.items():
+		values[e.g(k)[0]] = v
+	for i in e.equations:
+		v, c = e.g(i)
+		e.substitute(i, v, c, values)
+
+def timed(func, *args):
+	start = time.perf_counter()
+	func(*args)
+	return time.perf_counter() - start
+
+def run_benchmark(name, consts_file, filing_status, args):
+	# Return a list of times in seconds.
+	homes = households(args.households, filing_status, args.seed)
+	ans = []
+	for _ in range(args.repeat):
+		if name == 'build':
+			# Include parsing of the consts file.
+			clear_consts_cache()
+			ans.append(timed(build, consts_file, filing_status, (), None,
+							 True))
+		elif name == 'fixed':
+			for h in homes:
+				h = to_sympy(h)
+				def func():
+					run_inline(build(consts_file, filing_status, (), h), h)
+				ans.append(timed(func))
+		elif name.startswith('symbolic_'):
+			h = to_sympy(homes[0])
+			variable_inputs = VARIABLE_INPUTS[:int(name.split('_')[1])]
+			input_ranges = {}
+			if name.endswith('_range'):
+				input_ranges = INPUT_RANGES
+			def func():
+				run_inline(build(consts_file, filing_status,
+								 variable_inputs, h,
+								 input_ranges=input_ranges), h)
+			ans.append(timed(func))
+		elif name == 'kernel':
+			e = build(consts_file, filing_status, keep_references=True)
+			ans.append(timed(compile_kernel, e))
+		elif name == 'plot':
+			specs = ['v_f1040_16/v_f1040_15']
+			e = build(consts_file, filing_status, keep_references=True)
+			kernel = compile_kernel(e, plot.curve_names(specs))
+			ans.append(timed(plot.sample, kernel, homes[0], 'v_f1040_1a', 0,
+							 1000000, args.plot_samples, specs))
+		elif name == 'batch':
+			e = build(consts_file, filing_status, keep_references=True)
+			kernel = compile_kernel(e)
+			rows = households(args.batch_rows, filing_status, args.seed)
+			columns = {k: numpy.array([i[k] for i in rows], dtype=float)
+					   for k in rows[0]}
+			ans.append(timed(kernel, columns))
+		else:
+			raise ValueError('Unknown benchmark: %s' % name)
+	return ans
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument('-f', '--filing-statuses',
+						default=','.join(FILING_STATUSES),
+						help='comma-separated (default: %(default)s)')
+	parser.add_argument('-c', '--consts-files',
+						default=','.join(CONSTS_FILES),
+						help='comma-separated (default: %(default)s)')
+	parser.add_argument('-b', '--benchmarks', default=','.join(BENCHMARKS),
+						help='comma-separated (default: %(default)s)')
+	parser.add_argument('-o', '--output', default='bench.json',
+						help='JSON results file (default: %(default)s)')
+	parser.add_argument('--repeat', type=int, default=3)
+	parser.add_argument('--households', type=int, default=5,
+						help='households per fixed benchmark')
+	parser.add_argument('--plot-samples', type=int, default=100000)
+	parser.add_argument('--batch-rows', type=int, default=100000)
+	parser.add_argument('--seed', type=int, default=0)
+	args = parser.parse_args()
+	benchmarks = args.benchmarks.split(',')
+	for i in benchmarks:
+		if i not in BENCHMARKS:
+			parser.error('Unknown benchmark: %s' % i)
+
+	results = []
+	print('%-16s %-18s %-8s %10s %10s' %
+		  ('benchmark', 'consts', 'status', 'median', 'min'))
+	for name in benchmarks:
+		for consts_file in args.consts_files.split(','):
+			for filing_status in args.filing_statuses.split(','):
+				seconds = run_benchmark(name, consts_file, filing_status,
+										args)
+				result = {
+					'benchmark': name,
+					'consts_file': consts_file,
+					'filing_status': filing_status,
+					'median': statistics.median(seconds),
+					'min': min(seconds),
+					'seconds': seconds,
+				}
+				results.append(result)
+				print('%-16s %-18s %-8s %10.6f %10.6f' %
+					  (name, consts_file, filing_status, result['median'],
+					   result['min']), flush=True)
+
+	meta = {
+		'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+		'python': sys.version.split()[0],
+		'sympy': sympy.__version__,
+		'numpy': numpy.__version__,
+		'platform': platform.platform(),
+		'args': vars(args),
+	}
+	with open(args.output, 'w') as f:
+		json.dump({'meta': meta, 'results': results}, f, indent=1)
+
+if __name__ == '__main__':
+	main()
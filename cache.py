@@ -0,0 +1,100 @@
+#	sympy-tax - Using sympy to compute tax as an equation
+#	Copyright (C) 2024  lxylxy123456
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# On-disk cache keyed by content hashes. The cache directory is
+# $SYMPY_TAX_CACHE, or sympy-tax under $XDG_CACHE_HOME (default ~/.cache).
+# Setting SYMPY_TAX_CACHE to an empty string disables the cache.
+
+import glob, hashlib, importlib.metadata, os, pickle
+
+# Increase when the format of cached data changes.
+VERSION = 1
+
+def cache_dir():
+	ans = os.environ.get('SYMPY_TAX_CACHE')
+	if ans is not None:
+		return ans
+	base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+	return os.path.join(base, 'sympy-tax')
+
+def hash_bytes(*data):
+	h = hashlib.sha256()
+	for i in data:
+		h.update(hashlib.sha256(i).digest())
+	return h.hexdigest()
+
+def hash_files(*file_names):
+	return hash_bytes(*(open(i, 'rb').read() for i in file_names))
+
+def _path(kind, key):
+	return os.path.join(cache_dir(), '%s-%d-%s.pickle' % (kind, VERSION, key))
+
+def load(kind, key):
+	# Return the cached value, or None if it is not cached.
+	if not cache_dir():
+		return None
+	try:
+		with open(_path(kind, key), 'rb') as f:
+			return pickle.load(f)
+	except Exception:
+		# Also data pickled by other versions of the libraries.
+		return None
+
+def store(kind, key, value):
+	if not cache_dir():
+		return
+	path = _path(kind, key)
+	try:
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		# Write to a temporary file first, so readers in other processes never
+		# see a partial file.
+		tmp = '%s.%d.tmp' % (path, os.getpid())
+		with open(tmp, 'wb') as f:
+			pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+		os.replace(tmp, path)
+	except OSError:
+		pass
+
+def translate_filing_status(x):
+	return {
+		's': 's', 'single': 's',
+		'j': 'j', 'mfj': 'j', 'married filing jointly': 'j',
+		'h': 'h', 'hoh': 'h', 'head of household': 'h',
+		'p': 'p', 'mfs': 'p', 'married filing separately': 'p',
+		'q': 'q', 'qss': 'q', 'qualifying surviving spouse': 'q',
+	}[x.lower().replace('_', ' ').replace('-', ' ')]
+
+def source_files(*extra):
+	# Source files that define the model, followed by extra file names in the
+	# same directory.
+	d = os.path.dirname(os.path.abspath(__file__))
+	return [os.path.join(d, 'main.py')] + \
+		sorted(glob.glob(os.path.join(d, 'c_*.py'))) + \
+		[os.path.join(d, i) for i in extra]
+
+def model_key(file_name, f_filing_status, c_filing_status, *options,
+			  extra_sources=()):
+	# Key of data derived from the model. It includes the content of the
+	# consts file and the source files, the sympy version (read without
+	# importing sympy), and options as a list of reprs.
+	key = [
+		hash_files(file_name, *source_files(*extra_sources)),
+		importlib.metadata.version('sympy'),
+		translate_filing_status(f_filing_status),
+		translate_filing_status(c_filing_status),
+		*options,
+	]
+	return hash_bytes(repr(key).encode())
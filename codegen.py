@@ -0,0 +1,113 @@
+#	sympy-tax - Using sympy to compute tax as an equation
+#	Copyright (C) 2024  lxylxy123456
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Generate a standalone Python module from a model built with keep_references.
+# The module has one function with straight-line arithmetic, max / min, and
+# if statements for Piecewise. It does not need sympy.
+
+from sympy.printing.pycode import PythonCodePrinter
+
+class ModulePrinter(PythonCodePrinter):
+	def __init__(self):
+		super().__init__({'fully_qualified_modules': False})
+		# Statements that need to run before the printed expression.
+		self.statements = []
+		self.temps = 0
+
+	def _print_Piecewise(self, expr):
+		# Assign to a temporary variable with if / elif / else. Branches are
+		# printed first, so their own statements are not inside the if.
+		args = [(self._print(v), c == True, self._print(c))
+				for v, c in expr.args]
+		self.temps += 1
+		name = '_t%d' % self.temps
+		for k, (v, always, c) in enumerate(args):
+			if always and k == 0:
+				self.statements.append('%s = %s' % (name, v))
+				return name
+			elif always:
+				self.statements.append('else:')
+			else:
+				keyword = 'elif' if k else 'if'
+				self.statements.append('%s %s:' % (keyword, c))
+			self.statements.append('\t%s = %s' % (name, v))
+			if always:
+				return name
+		self.statements.append('else:')
+		self.statements.append('\t%s = math.nan' % name)
+		return name
+
+	def _print_Xor(self, expr):
+		return '(%s)' % ' ^ '.join('bool(%s)' % self._print(i)
+								   for i in expr.args)
+
+def module_source(e, header, outputs=None):
+	# header is a list of comment lines describing the model. If outputs is
+	# given, only compute these equations and their ancestors.
+	assert e.keep_references
+	equations = e.needed_equations(outputs)
+	if outputs is None:
+		outputs = e.equations
+	lines = ['# %s' % i for i in header]
+	lines += [
+		'# Generated by sympy-tax. Do not edit.',
+		'',
+		'import math, sys',
+		'',
+		'# Dict as {\'name\': default}.',
+		'INPUTS = {',
+	]
+	for sn, default in e.inputs.items():
+		lines.append('\t%r: %r,' % (str(sn), default))
+	lines += [
+		'}',
+		'',
+		'def compute(inputs):',
+		'\t# inputs is {\'name\': number}, missing inputs use INPUTS.',
+		'\t# Return {\'name\': (value, condition)}. If condition is false, the',
+		'\t# value is undefined.',
+	]
+	for sn in e.inputs:
+		lines.append('\t%s = inputs.get(%r, INPUTS[%r])' % (sn, str(sn),
+															 str(sn)))
+	for i in equations:
+		v, c = e.symbols[i]
+		printer = ModulePrinter()
+		vs, cs = printer.doprint(v), printer.doprint(c)
+		lines.append('\t# %s' % i)
+		lines.extend('\t' + s for s in printer.statements)
+		lines.append('\t%s = %s' % (i, vs))
+		lines.append('\t%s__cond = %s' % (i, cs))
+	lines.append('\treturn {')
+	for i in outputs:
+		lines.append('\t\t%r: (%s, %s__cond),' % (i, i, i))
+	lines += [
+		'\t}',
+		'',
+		'def main():',
+		'\t# Usage: python3 this_file.py [name=value ...]',
+		'\tinputs = {}',
+		'\tfor i in sys.argv[1:]:',
+		'\t\tk, v = i.split(\'=\')',
+		'\t\tassert k in INPUTS, \'Unknown input: %s\' % k',
+		'\t\tinputs[k] = float(v)',
+		'\tfor k, (v, c) in compute(inputs).items():',
+		'\t\tprint(k, \'=\', \'%.15g\' % v if c else \'undefined\')',
+		'',
+		'if __name__ == \'__main__\':',
+		'\tmain()',
+	]
+	return '\n'.join(lines) + '\n'
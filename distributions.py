@@ -0,0 +1,85 @@
+#	sympy-tax - Using sympy to compute tax as an equation
+#	Copyright (C) 2024  lxylxy123456
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Uncertain inputs. In an input file, a value can be a distribution written as
+# a dict, e.g. {dist: normal, mean: 10000, sd: 5000, min: 0}. The optional min
+# and max clip the samples. Deterministic modes use the mean of the
+# distribution (clipped to min and max), and montecarlo.py draws samples.
+
+import math
+
+# {'dist': (parameters, mean)}
+DISTRIBUTIONS = {
+	'normal': (['mean', 'sd'], lambda p: p['mean']),
+	'lognormal': (['mu', 'sigma'],
+				  lambda p: math.exp(p['mu'] + p['sigma'] ** 2 / 2)),
+	'uniform': (['lo', 'hi'], lambda p: (p['lo'] + p['hi']) / 2),
+	'triangular': (['lo', 'mode', 'hi'],
+				   lambda p: (p['lo'] + p['mode'] + p['hi']) / 3),
+}
+
+def check(spec):
+	# Raise ValueError if spec is not a valid distribution.
+	if spec.get('dist') not in DISTRIBUTIONS:
+		raise ValueError('Unknown distribution: %s' % spec.get('dist'))
+	params = DISTRIBUTIONS[spec['dist']][0]
+	for i in params:
+		if i not in spec:
+			raise ValueError('Missing parameter of %s: %s' % (spec['dist'], i))
+	for i in spec:
+		if i not in params + ['dist', 'min', 'max']:
+			raise ValueError('Unknown parameter of %s: %s' % (spec['dist'], i))
+
+def clip(x, spec):
+	if 'min' in spec:
+		x = max(x, spec['min'])
+	if 'max' in spec:
+		x = min(x, spec['max'])
+	return x
+
+def mean(spec):
+	check(spec)
+	return clip(DISTRIBUTIONS[spec['dist']][1](spec), spec)
+
+def point_value(v):
+	# Return the value used by deterministic modes for a value in an input
+	# file: a number, a distribution or a list of them (summed).
+	if type(v) == list:
+		return sum(map(point_value, v))
+	if type(v) == dict:
+		return mean(v)
+	return v
+
+def sample(v, rng, n):
+	# Same as point_value, but return n samples drawn with rng, a
+	# numpy.random.Generator.
+	import numpy
+	if type(v) == list:
+		return sum((sample(i, rng, n) for i in v), numpy.zeros(n))
+	if type(v) != dict:
+		return numpy.full(n, float(v))
+	check(v)
+	if v['dist'] == 'normal':
+		x = rng.normal(v['mean'], v['sd'], n)
+	elif v['dist'] == 'lognormal':
+		x = rng.lognormal(v['mu'], v['sigma'], n)
+	elif v['dist'] == 'uniform':
+		x = rng.uniform(v['lo'], v['hi'], n)
+	elif v['dist'] == 'triangular':
+		x = rng.triangular(v['lo'], v['mode'], v['hi'], n)
+	if 'min' in v or 'max' in v:
+		x = numpy.clip(x, v.get('min'), v.get('max'))
+	return x
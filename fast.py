@@ -0,0 +1,163 @@
+#	sympy-tax - Using sympy to compute tax as an equation
+#	Copyright (C) 2024  lxylxy123456
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Fast-start numeric mode. The model is converted to a program of nested
+# tuples, cached on disk, and interpreted without importing sympy. sympy is
+# only imported when the program is not cached yet.
+
+import argparse, math, operator
+
+import yaml
+
+import cache
+from distributions import point_value
+
+# A program is {'inputs': [(name, default)], 'equations': [(name, value,
+# condition)]}. value and condition are nodes: a number, a bool, ('sym',
+# name) or (op, *nodes). An equation's value is stored as its name, and its
+# condition as name + '__cond'.
+
+def _piecewise(env, *args):
+	for v, c in args:
+		if run_node(c, env):
+			return run_node(v, env)
+	return math.nan
+
+_ops = {
+	'add': sum,
+	'mul': math.prod,
+	'max': max,
+	'min': min,
+	'ge': lambda x: operator.ge(*x),
+	'gt': lambda x: operator.gt(*x),
+	'le': lambda x: operator.le(*x),
+	'lt': lambda x: operator.lt(*x),
+	'eq': lambda x: operator.eq(*x),
+	'ne': lambda x: operator.ne(*x),
+	'and': all,
+	'or': any,
+	'not': lambda x: not x[0],
+	'xor': lambda x: sum(map(bool, x)) % 2 == 1,
+}
+
+def run_node(node, env):
+	if type(node) is not tuple:
+		return node
+	op = node[0]
+	if op == 'sym':
+		return env[node[1]]
+	if op == 'pw':
+		return _piecewise(env, *node[1:])
+	return _ops[op]([run_node(i, env) for i in node[1:]])
+
+def run_program(program, inputs):
+	# inputs is {'name': number}. Return {'name': (value, condition)}.
+	env = {}
+	for name, default in program['inputs']:
+		env[name] = inputs.get(name, default)
+	result = {}
+	for name, value, condition in program['equations']:
+		v = env[name] = run_node(value, env)
+		c = env[name + '__cond'] = run_node(condition, env)
+		result[name] = (v, c)
+	return result
+
+def to_node(expr):
+	# Convert a sympy expression to a node.
+	import sympy
+	if expr.is_Symbol:
+		return ('sym', expr.name)
+	if expr == True or expr == False:
+		return bool(expr)
+	if expr.is_Integer:
+		return int(expr)
+	if expr.is_Number:
+		return float(expr)
+	if isinstance(expr, sympy.Piecewise):
+		return ('pw', *((to_node(v), to_node(c)) for v, c in expr.args))
+	ops = [
+		(sympy.Add, 'add'), (sympy.Mul, 'mul'), (sympy.Max, 'max'),
+		(sympy.Min, 'min'), (sympy.GreaterThan, 'ge'),
+		(sympy.StrictGreaterThan, 'gt'), (sympy.LessThan, 'le'),
+		(sympy.StrictLessThan, 'lt'), (sympy.Equality, 'eq'),
+		(sympy.Unequality, 'ne'), (sympy.And, 'and'), (sympy.Or, 'or'),
+		(sympy.Not, 'not'), (sympy.Xor, 'xor'),
+	]
+	for t, op in ops:
+		if isinstance(expr, t):
+			return (op, *map(to_node, expr.args))
+	raise ValueError('Cannot convert: %s' % expr)
+
+def build_program(file_name, f_filing_status, c_filing_status):
+	from main import Equation, compute_all_cached
+	e = Equation()
+	e.set_keep_references()
+	compute_all_cached(e, file_name, f_filing_status, c_filing_status)
+	program = {'inputs': [], 'equations': []}
+	for sn, default in e.inputs.items():
+		program['inputs'].append((sn.name, default))
+	for i in e.equations:
+		v, c = e.symbols[i]
+		program['equations'].append((i, to_node(v), to_node(c)))
+	return program
+
+def load_program(file_name, f_filing_status, c_filing_status):
+	# This file defines the program format.
+	key = cache.model_key(file_name, f_filing_status, c_filing_status,
+						  extra_sources=['fast.py'])
+	program = cache.load('program', key)
+	if program is None:
+		program = build_program(file_name, f_filing_status, c_filing_status)
+		cache.store('program', key, program)
+	return program
+
+def get_inputs(input_file):
+	# Same as get_inputs in main.py, with Python numbers.
+	inputs = {}
+	for k, v in yaml.load(open(input_file), yaml.Loader).items():
+		inputs[k] = point_value(v)
+	return inputs
+
+def format_number(x):
+	# Round to 12 significant digits to hide floating point errors, which
+	# still keeps the cents of amounts below 10 ** 10.
+	if x is None:
+		return 'undefined'
+	return '%.12g' % x
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument('-f', '--filing-status', default='single')
+	parser.add_argument('-c', '--consts-file', default='consts/2024.yml')
+	parser.add_argument('-i', '--input-file', default='input.yml')
+	parser.add_argument('--outputs',
+						help='comma-separated equation names to print')
+	args = parser.parse_args()
+
+	program = load_program(args.consts_file, args.filing_status,
+						   args.filing_status)
+	result = run_program(program, get_inputs(args.input_file))
+	outputs = result
+	if args.outputs:
+		outputs = args.outputs.split(',')
+	for i in outputs:
+		if i not in result:
+			parser.error('Unknown equation: %s' % i)
+		v, c = result[i]
+		print(i, '=', format_number(v if c else None))
+
+if __name__ == '__main__':
+	main()
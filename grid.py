@@ -0,0 +1,128 @@
+#	sympy-tax - Using sympy to compute tax as an equation
+#	Copyright (C) 2024  lxylxy123456
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Evaluate equations over an N-dimensional grid of inputs with the NumPy
+# kernel. The grid is flattened and split into chunks of rows, so memory use
+# does not depend on the grid size. Worker processes write their chunks
+# directly into a .npy file opened as a memory map.
+
+import argparse, json, multiprocessing, os
+
+import numpy
+
+import plot
+from kernel import get_kernel
+from main import get_inputs
+
+def parse_axis(spec):
+	# Parse "name=lo:hi:n" to (name, lo, hi, n).
+	name, _, r = spec.partition('=')
+	lo, hi, n = r.split(':')
+	return name, float(lo), float(hi), int(n)
+
+def axis_values(axes):
+	return [numpy.linspace(lo, hi, n) for _, lo, hi, n in axes]
+
+def evaluate(task):
+	# Compute rows [start, stop) of the flattened grid and write them to the
+	# output file.
+	(consts_file, filing_status, inputs, axes, specs, output, start,
+	 stop) = task
+	kernel = get_kernel(consts_file, filing_status,
+						tuple(plot.curve_names(specs)))
+	shape = tuple(n for _, _, _, n in axes)
+	index = numpy.unravel_index(numpy.arange(start, stop), shape)
+	columns = dict(inputs)
+	for (name, _, _, _), x, i in zip(axes, axis_values(axes), index):
+		columns[name] = x[i]
+	ys = plot.combine(kernel(columns), specs)
+	out = numpy.load(output, mmap_mode='r+')
+	rows = out.reshape(-1, len(specs))
+	for k, spec in enumerate(specs):
+		rows[start:stop, k] = ys[spec]
+	out.flush()
+	return stop - start
+
+def run_grid(consts_file, filing_status, inputs, axes, specs, output,
+			 dtype='float64', chunk_size=1 << 18, jobs=1):
+	# inputs is {'name': number} for the fixed inputs. Write an array of shape
+	# (n_1, ..., n_k, len(specs)) to output, with nan where conditions are
+	# false, and the axes to a JSON file next to it.
+	shape = tuple(n for _, _, _, n in axes)
+	out = numpy.lib.format.open_memmap(output, mode='w+', dtype=dtype,
+									   shape=shape + (len(specs),))
+	del out
+	meta = {
+		'consts_file': consts_file,
+		'filing_status': filing_status,
+		'axes': [{'name': name, 'lo': lo, 'hi': hi, 'n': n}
+				 for name, lo, hi, n in axes],
+		'outputs': specs,
+	}
+	with open(os.path.splitext(output)[0] + '.json', 'w') as f:
+		json.dump(meta, f, indent=1)
+	total = int(numpy.prod(shape))
+	tasks = [(consts_file, filing_status, inputs, axes, specs, output, i,
+			  min(i + chunk_size, total))
+			 for i in range(0, total, chunk_size)]
+	if jobs <= 1 or len(tasks) <= 1:
+		for i in tasks:
+			evaluate(i)
+	else:
+		with multiprocessing.Pool(min(jobs, len(tasks))) as pool:
+			for _ in pool.imap_unordered(evaluate, tasks):
+				pass
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument('-f', '--filing-status', default='single')
+	parser.add_argument('-c', '--consts-file', default='consts/2024.yml')
+	parser.add_argument('-i', '--input-file', default='input.yml',
+						help='values of inputs that are not on an axis')
+	parser.add_argument('-a', '--axis', action='append', required=True,
+						help='grid axis as name=lo:hi:n, can be repeated')
+	parser.add_argument('--outputs', required=True,
+						help='comma-separated curves as in --plot of main.py')
+	parser.add_argument('-o', '--output', default='grid.npy',
+						help='output .npy file (default: %(default)s)')
+	parser.add_argument('--dtype', default='float64',
+						choices=['float32', 'float64'])
+	parser.add_argument('--chunk-size', type=int, default=1 << 18,
+						help='number of grid points evaluated at once')
+	parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+						help='number of worker processes')
+	args = parser.parse_args()
+
+	axes = list(map(parse_axis, args.axis))
+	for name, lo, hi, n in axes:
+		if n < 1:
+			parser.error('Invalid number of points: %s' % name)
+	inputs = {k: float(v) for k, v in get_inputs(args.input_file).items()}
+	specs = args.outputs.split(',')
+	try:
+		kernel = get_kernel(args.consts_file, args.filing_status,
+							tuple(plot.curve_names(specs)))
+	except ValueError as err:
+		parser.error(str(err))
+	for name, _, _, _ in axes:
+		if name not in kernel.inputs:
+			parser.error('Unknown input: %s' % name)
+	run_grid(args.consts_file, args.filing_status, inputs, axes,
+			 specs, args.output, args.dtype,
+			 args.chunk_size, args.jobs)
+
+if __name__ == '__main__':
+	main()
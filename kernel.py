@@ -0,0 +1,110 @@
+#	sympy-tax - Using sympy to compute tax as an equation
+#	Copyright (C) 2024  lxylxy123456
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Compile the Equation graph into a NumPy kernel. Each input is a column (one
+# row per household), and each equation is computed once for all rows.
+
+import functools
+
+import numpy
+from sympy.printing.numpy import NumPyPrinter
+
+from main import Equation, compute_all_cached
+
+class KernelPrinter(NumPyPrinter):
+	# NumPyPrinter uses numpy.logical_*.reduce on tuples, which does not work
+	# when arrays are mixed with Python scalars.
+	def _print_reduce(self, func, args):
+		return '%s(%s, [%s])' % (self._module_format('functools.reduce'),
+								 self._module_format(func),
+								 ', '.join(map(self._print, args)))
+
+	def _print_And(self, expr):
+		return self._print_reduce('numpy.logical_and', expr.args)
+
+	def _print_Or(self, expr):
+		return self._print_reduce('numpy.logical_or', expr.args)
+
+	def _print_Xor(self, expr):
+		return self._print_reduce('numpy.logical_xor', expr.args)
+
+def build_reference_equation(file_name, f_filing_status, c_filing_status,
+							 outputs=None):
+	e = Equation()
+	e.set_keep_references()
+	compute_all_cached(e, file_name, f_filing_status, c_filing_status,
+					   outputs)
+	return e
+
+def kernel_source(e, func_name='kernel', outputs=None):
+	# If outputs is given, only compute these equations and their ancestors.
+	assert e.keep_references
+	equations = e.needed_equations(outputs)
+	if outputs is None:
+		outputs = e.equations
+	for i in outputs:
+		if i not in e.equations:
+			raise ValueError('Unknown equation: %s' % i)
+	printer = KernelPrinter()
+	lines = ['def %s(columns, n):' % func_name]
+	for sn, default in e.inputs.items():
+		lines.append('\t%s = columns.get(%r, %r)' % (sn, str(sn), default))
+	for i in equations:
+		v, c = e.symbols[i]
+		lines.append('\t%s = %s' % (i, printer.doprint(v)))
+		lines.append('\t%s__cond = %s' % (i, printer.doprint(c)))
+	lines.append('\treturn {')
+	for i in outputs:
+		lines.append('\t\t%r: (broadcast_to(%s, n, float), '
+					 'broadcast_to(%s__cond, n, bool)),' % (i, i, i))
+	lines.append('\t}')
+	return '\n'.join(lines) + '\n'
+
+def broadcast_to(value, n, dtype):
+	return numpy.broadcast_to(numpy.asarray(value, dtype=dtype), (n,))
+
+# Return kernel(columns), where columns is {'name': array} for inputs. Missing
+# inputs use their default values. The result is {'name': (values, condition
+# mask)} for every equation in outputs (default is all equations).
+# kernel.inputs is the list of input names.
+def compile_kernel(e, outputs=None):
+	namespace = {
+		'functools': functools,
+		'numpy': numpy,
+		'broadcast_to': broadcast_to,
+	}
+	exec(compile(kernel_source(e, outputs=outputs), '<kernel>', 'exec'),
+		 namespace)
+	func = namespace['kernel']
+	def kernel(columns):
+		columns = {k: numpy.asarray(v, dtype=float)
+				   for k, v in columns.items()}
+		n = max((len(v) for v in columns.values() if v.ndim), default=1)
+		return func(columns, n)
+	kernel.inputs = [str(i) for i in e.inputs]
+	return kernel
+
+def build_kernel(file_name, f_filing_status, c_filing_status, outputs=None):
+	e = build_reference_equation(file_name, f_filing_status, c_filing_status,
+								 outputs)
+	return compile_kernel(e, outputs)
+
+# Kernels are cached in each process. outputs must be a tuple or None. Build
+# the kernel in the main process before starting worker processes, so that
+# errors are reported once and workers read the model from the on-disk cache.
+@functools.cache
+def get_kernel(consts_file, filing_status, outputs):
+	return build_kernel(consts_file, filing_status, filing_status, outputs)
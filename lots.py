@@ -0,0 +1,90 @@
+#	sympy-tax - Using sympy to compute tax as an equation
+#	Copyright (C) 2024  lxylxy123456
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Import 1099-B lots from CSV files into Schedule D lines. Files are read row
+# by row, and only the totals of each line are kept, so memory use does not
+# depend on the number of lots. Amounts are added as Decimal to avoid rounding
+# errors.
+#
+# The header row needs the columns proceeds, basis and either box (Form 8949
+# box A to F) or term (short or long, same as box A or D). The column
+# adjustment is optional. Amounts may contain '$' and ',', and negative
+# amounts may be written in parentheses.
+
+import csv, decimal
+
+# {box: Schedule D line}
+BOXES = {'A': '1b', 'B': '2', 'C': '3', 'D': '8b', 'E': '9', 'F': '10'}
+# Lots in box A or D without adjustments are reported on line 1a or 8a.
+NO_ADJUSTMENT = {'A': '1a', 'D': '8a'}
+TERMS = {'short': 'A', 'long': 'D'}
+
+def parse_amount(s):
+	s = s.strip().replace('$', '').replace(',', '')
+	if not s:
+		return decimal.Decimal(0)
+	if s.startswith('(') and s.endswith(')'):
+		return -decimal.Decimal(s[1:-1])
+	return decimal.Decimal(s)
+
+def read_lots(file_name):
+	# Yield (box, proceeds, basis, adjustment) for each row.
+	with open(file_name, newline='') as f:
+		reader = csv.reader(f)
+		header = [i.strip().lower().replace(' ', '_') for i in next(reader)]
+		for i in ['proceeds', 'basis']:
+			if i not in header:
+				raise ValueError('%s: missing column: %s' % (file_name, i))
+		if 'box' not in header and 'term' not in header:
+			raise ValueError('%s: missing column: box or term' % file_name)
+		column = {k: header.index(k) for k in header}
+		for row in reader:
+			if not any(row):
+				continue
+			try:
+				if 'box' in column and row[column['box']].strip():
+					box = row[column['box']].strip().upper()
+				else:
+					box = TERMS[row[column['term']].strip().lower()]
+				if box not in BOXES:
+					raise KeyError(box)
+				proceeds = parse_amount(row[column['proceeds']])
+				basis = parse_amount(row[column['basis']])
+				adjustment = decimal.Decimal(0)
+				if 'adjustment' in column:
+					adjustment = parse_amount(row[column['adjustment']])
+			except (KeyError, IndexError, decimal.InvalidOperation):
+				raise ValueError('%s:%d: invalid lot: %s' %
+								 (file_name, reader.line_num, row))
+			yield box, proceeds, basis, adjustment
+
+def aggregate(file_names):
+	# Return {'name': number} of Schedule D inputs, e.g. {'v_f1040sd_1a_d':
+	# 5000, 'v_f1040sd_1a_e': 4990.5}.
+	totals = {}
+	def add(name, x):
+		totals[name] = totals.get(name, 0) + x
+	for file_name in file_names:
+		for box, proceeds, basis, adjustment in read_lots(file_name):
+			if adjustment or box not in NO_ADJUSTMENT:
+				line = BOXES[box]
+				add('v_f1040sd_%s_g' % line, adjustment)
+			else:
+				line = NO_ADJUSTMENT[box]
+			add('v_f1040sd_%s_d' % line, proceeds)
+			add('v_f1040sd_%s_e' % line, basis)
+	return {k: int(v) if v == v.to_integral_value() else float(v)
+			for k, v in totals.items()}
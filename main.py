@@ -14,37 +14,55 @@
 #	You should have received a copy of the GNU General Public License
 #	along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-import argparse, functools
+import argparse, functools, json, sys, time
 
 import yaml, sympy
 from sympy import symbols
 from sympy.logic.boolalg import BooleanTrue, BooleanFalse
 
+import cache
+from cache import translate_filing_status
+from distributions import point_value
 from c_f1040 import compute_f1040
 from c_ca540 import compute_ca540
 
+def compile_consts(data):
+	# Resolve the filing status keys (e.g. 'sjphq') of each section once.
+	# Return {'global': {'name': value}, 'f_filing_status': {'s': {'name':
+	# value}, ...}, 'c_filing_status': {'s': {'name': value}, ...}}.
+	ans = {'global': dict(data['global'])}
+	for section in ['f_filing_status', 'c_filing_status']:
+		ans[section] = {fs: {} for fs in 'sjhpq'}
+		for k, v in data[section].items():
+			for fs in 'sjhpq':
+				vv = [x[1] for x in v.items() if fs in x[0]]
+				assert len(vv) == 1
+				ans[section][fs][k] = vv[0]
+	return ans
+
+@functools.cache
+def _load_consts(key, file_name):
+	ans = cache.load('consts', key)
+	if ans is None:
+		ans = compile_consts(yaml.load(open(file_name), yaml.Loader))
+		cache.store('consts', key, ans)
+	return ans
+
+def load_consts(file_name):
+	# Cached by file content, so YAML is only parsed when the file changes.
+	return _load_consts(cache.hash_files(file_name), file_name)
+
+def clear_consts_cache():
+	# Forget consts files parsed in this process, e.g. to time parsing.
+	_load_consts.cache_clear()
+
 def get_consts(file_name, f_filing_status, c_filing_status):
-	fs_translate = lambda x: {
-		's': 's', 'single': 's',
-		'j': 'j', 'mfj': 'j', 'married filing jointly': 'j',
-		'h': 'h', 'hoh': 'h', 'head of household': 'h',
-		'p': 'p', 'mfs': 'p', 'married filing separately': 'p',
-		'q': 'q', 'qss': 'q', 'qualifying surviving spouse': 'q',
-	}[x.lower().replace('_', ' ').replace('-', ' ')]
-	f_fs = fs_translate(f_filing_status)
-	c_fs = fs_translate(c_filing_status)
-	assert f_fs in ['s', 'j', 'h', 'p', 'q']
-	data = yaml.load(open(file_name), yaml.Loader)
-	for k, v in data['global'].items():
-		yield k, v
-	for k, v in data['f_filing_status'].items():
-		vv = list(filter(lambda x: f_fs in x[0], v.items()))
-		assert len(vv) == 1
-		yield k, next(iter(vv))[1]
-	for k, v in data['c_filing_status'].items():
-		vv = list(filter(lambda x: c_fs in x[0], v.items()))
-		assert len(vv) == 1
-		yield k, next(iter(vv))[1]
+	f_fs = translate_filing_status(f_filing_status)
+	c_fs = translate_filing_status(c_filing_status)
+	data = load_consts(file_name)
+	yield from data['global'].items()
+	yield from data['f_filing_status'][f_fs].items()
+	yield from data['c_filing_status'][c_fs].items()
 
 # Naming convention:
 #	c_*: constant
@@ -63,21 +81,57 @@ class Equation:
 		self.variable_inputs = set()
 		# Dict as {'name': value}, for inputs that do not have default values.
 		self.fixed_inputs = {}
+		# If True, all inputs are variable and get_symbol returns references
+		# to earlier equations instead of their inlined expressions.
+		self.keep_references = False
+		# Dict as {'name': (symbol, condition)}, for references to equations.
+		self.references = {}
+		# Dict as {'name': ['name']}, for symbols read by each equation.
+		self.dependencies = {}
+		# Dict as {'name': ['name']}, for equations that read each symbol.
+		self.dependents = {}
+		# Symbols read by get_symbol since the last definition.
+		self._reads = {}
+		# Dict as {'name': {'metric': value}}, if profiling is enabled.
+		self.profile = None
+		# Dict as {symbol: (lo, hi)}, for declared ranges of variable inputs.
+		self.input_box = {}
+		# Memos of regions.prune for input_box.
+		self._prune_memo = {}
+		self._interval_memo = {}
 
 	def set_variable_fixed_inputs(self, variable_inputs, fixed_inputs):
 		self.variable_inputs = variable_inputs
 		self.fixed_inputs = fixed_inputs
 
+	def set_input_ranges(self, input_ranges):
+		# input_ranges is {'name': (lo, hi)} for variable inputs. Branches that
+		# cannot be taken in these ranges are removed when building.
+		self.input_box = {symbols(k): v for k, v in input_ranges.items()}
+
+	def set_keep_references(self, keep_references=True):
+		self.keep_references = keep_references
+
+	def set_profile(self, profile=True):
+		self.profile = {} if profile else None
+
+	def _profile(self, name, metric, start):
+		# Record the time since start.
+		if self.profile is not None:
+			self.profile.setdefault(name, {})[metric] = \
+				time.perf_counter() - start
+
 	def _set_symbol(self, name, value, condition):
 		assert isinstance(value, sympy.core.basic.Basic)
 		assert isinstance(condition, sympy.core.basic.Basic)
 		assert name not in self.symbols
 		self.symbols[name] = (value, condition)
+		self.dependents[name] = []
 
 	def define_input(self, name, default=0, condition=BooleanTrue()):
 		assert name not in self.inputs
 		assert name not in self.symbols
-		if name not in self.variable_inputs:
+		if name not in self.variable_inputs and not self.keep_references:
 			sn = sympy.core.numbers.Number(self.fixed_inputs.get(name, default))
 		else:
 			sn = symbols(name)
@@ -94,18 +148,37 @@ class Equation:
 		return self.define_const(*args, **kwargs)
 
 	def define_equation(self, name, value, condition):
+		start = time.perf_counter()
 		assert name not in self.symbols
 		if not isinstance(value, sympy.core.basic.Basic):
 			print('Warning: %s is const but is defined as equation' % name)
 			value = sympy.core.numbers.Number(value)
 		if not isinstance(condition, sympy.core.basic.Basic):
 			condition = {True: BooleanTrue, False: BooleanFalse}[condition]()
+		if self.input_box and not self.keep_references:
+			import regions
+			value, condition = (
+				regions.prune(i, self.input_box, self._prune_memo,
+							  self._interval_memo) for i in (value, condition))
 		self._set_symbol(name, value, condition)
 		self.equations.append(name)
+		self.dependencies[name] = list(self._reads)
+		for i in self._reads:
+			self.dependents[i].append(name)
+		self._reads = {}
+		if self.keep_references:
+			# Numbers and trivial conditions are cheaper to inline.
+			if not value.is_Number:
+				value = symbols(name)
+			if condition not in (True, False):
+				condition = symbols(name + '__cond')
+			self.references[name] = (value, condition)
+		self._profile(name, 'build', start)
 	def de(self, *args, **kwargs):
 		return self.define_equation(*args, **kwargs)
 
 	def define_equation_decorator(self, func):
+		start = time.perf_counter()
 		name = func.__code__.co_name
 		condition = True
 		def _get_symbol(name):
@@ -116,10 +189,12 @@ class Equation:
 		value, c = func(_get_symbol)
 		condition &= c
 		self.define_equation(name, value, condition)
+		self._profile(name, 'build', start)
 	def ded(self, *args, **kwargs):
 		return self.define_equation_decorator(*args, **kwargs)
 
 	def define_equation_decorator2(self, func):
+		start = time.perf_counter()
 		name = func.__code__.co_name
 		def _get_symbol_condition(name):
 			nonlocal condition
@@ -127,86 +202,561 @@ class Equation:
 			return v, c
 		value, condition = func(_get_symbol_condition)
 		self.define_equation(name, value, condition)
+		self._profile(name, 'build', start)
 	def ded2(self, *args, **kwargs):
 		return self.define_equation_decorator2(*args, **kwargs)
 
 	def get_symbol(self, name):
+		# Record the read, so define_equation knows the dependencies.
+		self._reads[name] = None
+		if name in self.references:
+			return self.references[name]
 		return self.symbols[name]
 	def g(self, *args, **kwargs):
 		return self.get_symbol(*args, **kwargs)
 
+	def ancestors(self, names):
+		# Return all symbols that the given symbols depend on.
+		ans = set()
+		todo = list(names)
+		while todo:
+			for i in self.dependencies.get(todo.pop(), []):
+				if i not in ans:
+					ans.add(i)
+					todo.append(i)
+		return ans
+
+	def descendants(self, names):
+		# Return all equations that depend on the given symbols.
+		ans = set()
+		todo = list(names)
+		while todo:
+			for i in self.dependents[todo.pop()]:
+				if i not in ans:
+					ans.add(i)
+					todo.append(i)
+		return ans
+
+	def topological_order(self, names=None):
+		# A symbol can only be read after it is defined, so the definition
+		# order is a topological order.
+		if names is None:
+			return list(self.symbols)
+		return [i for i in self.symbols if i in names]
+
+	def evaluate(self, inputs, names=None):
+		# Compute each equation once in definition order, so later equations
+		# read the computed values of earlier equations through references.
+		# If names is given, only compute these equations and their ancestors.
+		# Return {'name': (value, condition)}.
+		assert self.keep_references
+		values = {}
+		for sn, default in self.inputs.items():
+			value = inputs.get(str(sn), default)
+			values[sn] = sympy.core.numbers.Number(value)
+		equations = self.needed_equations(names)
+		return {i: self.evaluate_equation(i, values) for i in equations}
+
+	def needed_equations(self, names=None):
+		# Return equations needed to compute names, in definition order.
+		if names is None:
+			return self.equations
+		return self.topological_order(
+			self.ancestors(names).union(names).intersection(self.equations))
+
+	def reduce(self, inputs, variable_inputs, names=None):
+		# Like evaluate, but inputs in variable_inputs are kept as symbols.
+		# Equations that depend on them stay as references in later equations,
+		# so each result only grows with the size of its own equation. Use
+		# expand to substitute the references.
+		assert self.keep_references
+		values = {}
+		for sn, default in self.inputs.items():
+			if str(sn) not in variable_inputs:
+				value = inputs.get(str(sn), default)
+				values[sn] = sympy.core.numbers.Number(value)
+		result = {}
+		for i in self.needed_equations(names):
+			v, c = self.symbols[i]
+			rv, rc = self.references[i]
+			vs = v.xreplace(values)
+			cs = c.xreplace(values)
+			if vs.is_Atom:
+				values[rv] = vs
+			if cs.is_Atom:
+				values[rc] = cs
+			result[i] = (vs, cs)
+		return result
+
+	def expand(self, reduced, names):
+		# Substitute references in the results of reduce for names.
+		values = {}
+		result = {}
+		for i in self.needed_equations(names):
+			vs, cs = reduced[i]
+			rv, rc = self.references[i]
+			values[rv] = result_v = vs.xreplace(values)
+			values[rc] = result_c = cs.xreplace(values)
+			result[i] = (result_v, result_c)
+		return {i: result[i] for i in names}
+
+	def inline_from(self, model, names=None):
+		# Define the symbols of this inline model from model, which is built
+		# with keep_references. Fixed inputs are substituted and references are
+		# expanded, which gives the same result as building in inline mode.
+		# If names is given, only define these equations and their ancestors.
+		assert not self.keep_references and model.keep_references
+		needed = set(model.needed_equations(names))
+		values = {}
+		for name, (v, c) in model.symbols.items():
+			if name in model.references and name not in needed:
+				continue
+			if name in model.consts:
+				self._set_symbol(name, v, c)
+				self.consts.append(name)
+			elif name not in model.references:
+				# An input.
+				if name not in self.variable_inputs:
+					default = model.inputs[v]
+					values[v] = sympy.core.numbers.Number(
+						self.fixed_inputs.get(name, default))
+				sn = values.get(v, v)
+				self.inputs[sn] = model.inputs[v]
+				self._set_symbol(name, sn, c)
+			else:
+				vs, cs = v.xreplace(values), c.xreplace(values)
+				if self.input_box:
+					import regions
+					vs, cs = (regions.prune(i, self.input_box,
+											self._prune_memo,
+											self._interval_memo)
+							  for i in (vs, cs))
+				rv, rc = model.references[name]
+				if rv.is_Symbol:
+					values[rv] = vs
+				if rc.is_Symbol:
+					values[rc] = cs
+				self._set_symbol(name, vs, cs)
+				self.equations.append(name)
+		self.dependencies = model.dependencies
+		self.dependents = model.dependents
+
+	def evaluate_equation(self, name, values):
+		# Compute one equation from values as {symbol: value}, which must
+		# contain the inputs and the equations it reads, and store the result
+		# into values.
+		v, c = self.symbols[name]
+		rv, rc = self.references[name]
+		vs, cs = self.substitute(name, v, c, values)
+		values[rv] = vs
+		values[rc] = cs
+		return vs, cs
+
+	def substitute(self, name, value, condition, values):
+		# Substitute values as {symbol: value} into the value and condition of
+		# an equation.
+		# Using xreplace because subs is slow.
+		# https://github.com/sympy/sympy/issues/22240
+		start = time.perf_counter()
+		vs = value.xreplace(values)
+		self._profile(name, 'evaluate_value', start)
+		start = time.perf_counter()
+		cs = condition.xreplace(values)
+		self._profile(name, 'evaluate_condition', start)
+		return vs, cs
+
+	def profile_sizes(self):
+		# Record expression sizes of all equations.
+		for i in self.equations:
+			v, c = self.symbols[i]
+			p = self.profile.setdefault(i, {})
+			p['count_ops'] = sympy.count_ops(v) + sympy.count_ops(c)
+			p['nodes'] = sum(1 for x in (v, c)
+							 for _ in sympy.preorder_traversal(x))
+			p['repr_len'] = len(repr(v)) + len(repr(c))
+
 def compute_consts(e, file_name, f_filing_status, c_filing_status):
 	for k, v in get_consts(file_name, f_filing_status, c_filing_status):
 		e.dc(k, v)
 
+def need_ca540(outputs):
+	# Federal forms do not depend on California forms.
+	return outputs is None or any(i.startswith('v_ca540') for i in outputs)
+
+def compute_all(e, file_name, f_filing_status, c_filing_status, outputs=None):
+	# If outputs is given, skip forms that none of the outputs depend on.
+	compute_consts(e, file_name, f_filing_status, c_filing_status)
+	compute_f1040(e)
+	if need_ca540(outputs):
+		compute_ca540(e)
+
+# Attributes of Equation that are built by compute_all. Other attributes are
+# options of the current run, and are not cached.
+MODEL_FIELDS = ['symbols', 'consts', 'equations', 'inputs', 'references',
+				'dependencies', 'dependents']
+
+def compute_all_cached(e, file_name, f_filing_status, c_filing_status,
+					   outputs=None):
+	# Same as compute_all, but the built model is cached on disk. The cache
+	# key includes the content of the consts file and the source files. Only
+	# models built with keep_references are cached; inline models are derived
+	# from them, so the cache does not depend on inputs.
+	if not e.keep_references:
+		model = Equation()
+		model.set_keep_references()
+		compute_all_cached(model, file_name, f_filing_status, c_filing_status,
+						   outputs)
+		e.inline_from(model, outputs)
+		return
+	key = cache.model_key(file_name, f_filing_status, c_filing_status,
+						  need_ca540(outputs))
+	state = cache.load('model', key)
+	if state is not None:
+		for i in MODEL_FIELDS:
+			setattr(e, i, state[i])
+		return
+	compute_all(e, file_name, f_filing_status, c_filing_status, outputs)
+	cache.store('model', key, {i: getattr(e, i) for i in MODEL_FIELDS})
+
 @functools.cache
-def get_inputs(input_file):
+def get_inputs(input_file, lots_files=()):
+	# Lots in the 1099-B CSV files lots_files are added to Schedule D.
 	inputs = {}
 	for k, v in yaml.load(open(input_file), yaml.Loader).items():
 		if type(v) == list:
-			value = sum(v, start=sympy.core.numbers.Number(0))
+			value = sum(map(sympy.core.numbers.Number, map(point_value, v)),
+						start=sympy.core.numbers.Number(0))
 		else:
-			value = sympy.core.numbers.Number(v)
+			value = sympy.core.numbers.Number(point_value(v))
 		inputs[k] = value
+	if lots_files:
+		import lots
+		lot_inputs = lots.aggregate(lots_files)
+	else:
+		lot_inputs = {}
+	for k, v in lot_inputs.items():
+		value = sympy.core.numbers.Number(v)
+		inputs[k] = inputs.get(k, sympy.core.numbers.Number(0)) + value
 	return inputs
 
 def format_exp(e):
-	s = repr(e)
+	s = e if isinstance(e, str) else repr(e)
 	if len(s) > 60:
 		s = s[:60] + '...' + ' (%d)' % len(s)
 	return s
 
+def print_regions(name, value, condition, box, file=None):
+	# Print the value in each region where the condition is decided.
+	import regions
+	result = regions.decompose(value, condition, box)
+	print('%d regions' % len(result), file=file)
+	for constraints, v, c in result:
+		print(' ' * len(name), '  if', format_exp(regions.format_region(
+			constraints)), file=file)
+		print(' ' * len(name), '   ', format_exp(v) if c else 'undefined',
+			  file=file)
+
+def print_profile(profile):
+	# Print equations sorted by total time, slowest first.
+	times = ['build', 'evaluate_value', 'evaluate_condition']
+	sizes = ['count_ops', 'nodes', 'repr_len']
+	total = lambda i: sum(profile[i].get(j, 0) for j in times)
+	print('%-24s %9s %9s %9s %9s %9s %9s %9s' %
+		  ('equation', 'total', 'build', 'eval_v', 'eval_c', 'ops', 'nodes',
+		   'repr'))
+	for i in sorted(profile, key=total, reverse=True):
+		p = profile[i]
+		print('%-24s' % i, '%9.6f' % total(i),
+			  *('%9.6f' % p.get(j, 0) for j in times),
+			  *('%9d' % p.get(j, 0) for j in sizes))
+	print('%-24s %9.6f' % ('(total)', sum(map(total, profile))))
+
 def main():
 	parser = argparse.ArgumentParser()
 	parser.add_argument('-f', '--filing-status', default='single')
 	parser.add_argument('-c', '--consts-file', default='consts/2024.yml')
 	parser.add_argument('-i', '--input-file', default='input.yml')
+	parser.add_argument('--lots', metavar='FILES',
+						help='comma-separated 1099-B CSV files of lots to add '
+						'to Schedule D')
 	parser.add_argument('-v', '--verbose', action='store_true')
 	parser.add_argument('--variable-inputs',
 						help='comma-separated input names that may vary')
-	parser.add_argument('--plot', action='store_true')
+	parser.add_argument('--input-range', metavar='RANGES',
+						help='comma-separated ranges of variable inputs as '
+						'name=lo:hi, e.g. v_f1040_1a=50000:300000')
+	parser.add_argument('--by-line', action='store_true',
+						help='compute each equation once from earlier values')
+	parser.add_argument('--expand', action='store_true',
+						help='with --by-line -v, substitute line references')
+	parser.add_argument('--outputs',
+						help='comma-separated equation names to compute')
+	parser.add_argument('--format', default='text',
+						choices=['text', 'jsonl', 'csv'],
+						help='format of equation values (default: '
+						'%(default)s)')
+	parser.add_argument('-o', '--output',
+						help='file of equation values (default: standard '
+						'output)')
+	parser.add_argument('--piecewise-linear', action='store_true',
+						help='with -v and one variable input, print equations '
+						'as piecewise linear functions (implies --by-line)')
+	parser.add_argument('--regions', action='store_true',
+						help='keep variable inputs symbolic, and split lines '
+						'with undecided conditions into regions')
+	parser.add_argument('--marginal', metavar='SPECS',
+						help='with one variable input, print marginal rates '
+						'of comma-separated sums of lines, e.g. v_f1040_24+'
+						'v_ca540_64 (implies --by-line)')
+	parser.add_argument('--solve', metavar='GOALS',
+						help='with one variable input, find the smallest '
+						'value of it that makes comma-separated sums of lines '
+						'reach targets, e.g. v_f1040_37=0 or v_ca540_13='
+						'c_ca540_32_fed_agi (implies --by-line)')
+	parser.add_argument('--solve-range', default='-inf,inf',
+						help='range of the variable input to search (default: '
+						'%(default)s)')
+	parser.add_argument('--breakpoints', metavar='SPECS',
+						help='with one variable input, list kinks and cliffs '
+						'of comma-separated sums of lines (implies --by-line)')
+	parser.add_argument('--breakpoints-range', default='-inf,inf',
+						help='range of the variable input to list (default: '
+						'%(default)s)')
+	parser.add_argument('--emit-module', metavar='FILE',
+						help='write a standalone Python module that computes '
+						'the equations, and exit')
+	parser.add_argument('--plot', action='store_true',
+						help='plot curves against the first variable input')
+	parser.add_argument('--plot-curves', default='v_f1040_16/v_f1040_15',
+						help='comma-separated curves to plot, each as lines '
+						'or a ratio of lines, e.g. v_f1040_24+v_ca540_64/'
+						'v_f1040_11 (default: %(default)s)')
+	parser.add_argument('--plot-range', default='0,1000000',
+						help='range of the variable input (default: '
+						'%(default)s)')
+	parser.add_argument('--plot-samples', type=int, default=100000)
+	parser.add_argument('--profile', action='store_true',
+						help='report build time, size and evaluation time of '
+						'each equation (does not use the model cache)')
+	parser.add_argument('--profile-json', metavar='FILE',
+						help='also write the profile as JSON (implies '
+						'--profile)')
 	args = parser.parse_args()
+	if args.profile_json:
+		args.profile = True
+	if args.format != 'text' and args.verbose:
+		parser.error('-v only works with --format text')
+	if args.emit_module:
+		args.by_line = True
+	if (args.piecewise_linear or args.marginal or args.solve or
+		args.breakpoints):
+		if not args.variable_inputs or ',' in args.variable_inputs:
+			parser.error('--piecewise-linear, --marginal, --solve and '
+						 '--breakpoints need one variable input')
+		args.by_line = True
+
+	# e.g. ('lots.csv',)
+	lots_files = ()
+	if args.lots:
+		lots_files = tuple(args.lots.split(','))
+	read_inputs = functools.partial(get_inputs, args.input_file, lots_files)
+	try:
+		read_inputs()
+	except ValueError as err:
+		parser.error(str(err))
 
 	e = Equation()
 	# e.g. {'v_f1040_1a'}
 	variable_inputs = set()
 	if args.variable_inputs:
 		variable_inputs = args.variable_inputs.split(',')
-	e.set_variable_fixed_inputs(variable_inputs, get_inputs(args.input_file))
-	compute_consts(e, args.consts_file, args.filing_status, args.filing_status)
-	compute_f1040(e)
-	compute_ca540(e)
+	e.set_variable_fixed_inputs(variable_inputs, read_inputs())
+	# e.g. {'v_f1040_1a': (50000.0, 300000.0)}
+	input_ranges = {}
+	if args.input_range:
+		for i in args.input_range.split(','):
+			k, v = i.split('=')
+			if k not in variable_inputs:
+				parser.error('%s in --input-range is not a variable input' % k)
+			lo, hi = v.split(':')
+			input_ranges[k] = (float(lo or '-inf'), float(hi or 'inf'))
+	# The number of regions grows too fast over unbounded planes.
+	if args.regions and len(variable_inputs) > 1:
+		for k in variable_inputs:
+			if k not in input_ranges:
+				parser.error('--regions with more than one variable input '
+							 'needs --input-range of %s' % k)
+	e.set_input_ranges(input_ranges)
+	e.set_keep_references(args.by_line)
+	# e.g. ['v_f1040_37', 'v_ca540_100']
+	outputs = None
+	if args.outputs:
+		outputs = args.outputs.split(',')
+	# e.g. ['v_f1040_24+v_ca540_64']
+	marginal = []
+	if args.marginal:
+		marginal = args.marginal.split(',')
+	# e.g. [('v_f1040_37', '0')]
+	goals = []
+	if args.solve:
+		for i in args.solve.split(','):
+			spec, eq, target = i.partition('=')
+			if not eq or not spec or not target:
+				parser.error('%s in --solve is not as lines=target' % i)
+			goals.append((spec, target))
+	# e.g. ['v_f1040_24+v_ca540_64']
+	breakpoints = []
+	if args.breakpoints:
+		breakpoints = args.breakpoints.split(',')
+	# Equations that need to be built.
+	specs = marginal + [spec for spec, _ in goals] + breakpoints
+	needed = None
+	if outputs is not None:
+		needed = outputs + [j for s in specs for j in s.split('+')]
+	e.set_profile(args.profile)
+	if args.profile:
+		# Cached models have no build times.
+		compute_all(e, args.consts_file, args.filing_status,
+					args.filing_status, needed)
+		e.profile_sizes()
+	else:
+		compute_all_cached(e, args.consts_file, args.filing_status,
+						   args.filing_status, needed)
+	for i in needed or [j for s in specs for j in s.split('+')]:
+		if i not in e.equations:
+			parser.error('Unknown equation: %s' % i)
+	for k, (spec, target) in enumerate(goals):
+		# A target is a number or the name of a const.
+		if target in e.consts:
+			goals[k] = (spec, e.symbols[target][0])
+		else:
+			try:
+				goals[k] = (spec, sympy.core.numbers.Number(target))
+			except ValueError:
+				parser.error('Unknown target in --solve: %s' % target)
+	if args.emit_module:
+		from codegen import module_source
+		header = ['Consts file: %s' % args.consts_file,
+				  'Filing status: %s' % args.filing_status]
+		with open(args.emit_module, 'w') as f:
+			f.write(module_source(e, header, outputs))
+		return
+	if outputs is None:
+		outputs = e.equations
 	inputs = e.inputs.copy()
-	for k, v in get_inputs(args.input_file).items():
-		inputs[e.g(k)[0]] = v
-	for i in e.equations:
-		v, c = e.g(i)
-		print(i, '=', end=' ')
+	for k, v in read_inputs().items():
+		# Inputs of skipped forms are not defined.
+		if k in e.symbols or not args.outputs:
+			inputs[e.g(k)[0]] = v
+	if args.regions:
+		for k in variable_inputs:
+			inputs.pop(symbols(k), None)
+	# Branches outside the declared ranges may have been removed.
+	for x, (lo, hi) in e.input_box.items():
+		if x in inputs and not lo <= inputs[x] <= hi:
+			parser.error('%s = %s is outside --input-range %.15g:%.15g' %
+						 (x, inputs[x], lo, hi))
+	if args.by_line:
+		if args.regions:
+			results = e.expand(e.reduce(read_inputs(),
+										variable_inputs, outputs), outputs)
+		else:
+			results = e.evaluate(read_inputs(), outputs)
 		if args.verbose:
-			print(format_exp(v))
+			reduced = e.reduce(read_inputs(), variable_inputs,
+							   outputs)
+			if args.expand:
+				reduced = e.expand(reduced, outputs)
+			if args.piecewise_linear:
+				import pwl
+				lines = pwl.compute_lines(e, read_inputs(),
+										  args.variable_inputs, outputs)
+	f = open(args.output, 'w', newline='') if args.output else sys.stdout
+	writer = None
+	if args.format != 'text':
+		from writers import WRITERS
+		writer = WRITERS[args.format](f)
+	for i in outputs:
+		if args.piecewise_linear and args.verbose:
+			v, c = str(lines[i][0]), pwl.format_condition(lines[i][1])
+		elif args.by_line and args.verbose:
+			v, c = reduced[i]
+		else:
+			v, c = e.g(i)
+		if args.by_line:
+			vs, cs = results[i]
+		else:
+			vs, cs = e.substitute(i, v, c, inputs)
+		if writer is not None:
+			writer.write(args.input_file, i, vs, cs)
+			continue
+		print(i, '=', end=' ', file=f)
+		if args.verbose:
+			print(format_exp(v), file=f)
 			if c != True:
-				print(' ' * len(i), '  if', format_exp(c))
-			print(' ' * len(i), '=', end=' ')
-		# Using xreplace because subs is slow.
-		# https://github.com/sympy/sympy/issues/22240
-		cs = c.xreplace(inputs)
+				print(' ' * len(i), '  if', format_exp(c), file=f)
+			print(' ' * len(i), '=', end=' ', file=f)
 		if cs == True:
-			print(v.xreplace(inputs))
+			print(vs, file=f)
 		elif cs == False:
-			print('undefined')
+			print('undefined', file=f)
 		else:
-			raise RuntimeError('Cannot evaluate condition')
+			print_regions(i, vs, cs, e.input_box, f)
 		if args.verbose:
-			print()
+			print(file=f)
+	if args.output:
+		f.close()
+
+	if args.marginal:
+		import pwl
+		rates = pwl.marginal_rates(e, read_inputs(),
+								   args.variable_inputs, marginal)
+		for spec, rate in rates.items():
+			print('d(%s)/d(%s) = %s' % (spec, args.variable_inputs, rate))
+
+	if args.solve:
+		import pwl
+		lo, hi = map(float, args.solve_range.split(','))
+		solutions = pwl.goal_seek(e, read_inputs(),
+								  args.variable_inputs, goals, lo, hi)
+		for (spec, target), x in zip(goals, solutions):
+			print('%s = %s' % (args.variable_inputs,
+							   'no solution' if x is None else float(x)),
+				  '(%s = %s)' % (spec, target))
+
+	if args.breakpoints:
+		import pwl
+		lo, hi = map(float, args.breakpoints_range.split(','))
+		result = pwl.line_breakpoints(e, read_inputs(),
+									  args.variable_inputs, breakpoints, lo,
+									  hi)
+		for spec, points in result.items():
+			print('%s:' % spec)
+			for i in points:
+				print('\t%s = %s' % (args.variable_inputs,
+									 pwl.format_breakpoint(*i)))
+
+	if args.profile:
+		print_profile(e.profile)
+		if args.profile_json:
+			with open(args.profile_json, 'w') as f:
+				json.dump(e.profile, f, indent=1)
 
 	if args.plot:
-		# TODO: plotting does not implement condition check yet.
-		from sympy import plot
-		x = e.g('v_f1040_1a')[0]
-		del inputs[symbols('v_f1040_1a')]
-		y = (e.g('v_f1040_16')[0] / e.g('v_f1040_15')[0]).subs(inputs.items())
-		print(repr(y).replace('v_f1040_1a', 'x'))
-		plot(y, (x, 0, 1000000))
+		import plot
+		x_name = 'v_f1040_1a'
+		if variable_inputs:
+			x_name = next(iter(variable_inputs))
+		lo, hi = map(float, args.plot_range.split(','))
+		if args.marginal:
+			import numpy
+			x = numpy.linspace(lo, hi, args.plot_samples)
+			ys = {'d(%s)' % k: v.evaluate(x) for k, v in rates.items()}
+			plot.show(x_name, x, ys)
+			return
+		plot.plot(args.consts_file, args.filing_status, args.filing_status,
+				  read_inputs(), x_name, lo, hi,
+				  args.plot_samples, args.plot_curves.split(','))
 
 if __name__ == '__main__':
 	main()
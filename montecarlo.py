@@ -0,0 +1,127 @@
+#	sympy-tax - Using sympy to compute tax as an equation
+#	Copyright (C) 2024  lxylxy123456
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Monte Carlo simulation of uncertain inputs. Inputs given as distributions in
+# the input file are sampled in batches, and each batch is evaluated with the
+# NumPy kernel. Every batch has its own seed, so results do not depend on the
+# number of worker processes.
+
+import argparse, multiprocessing, os
+
+import numpy
+import yaml
+
+import distributions
+import plot
+from kernel import get_kernel
+from sweep import format_table
+
+# Federal and CA tax due.
+LINES = ['v_f1040_37', 'v_ca540_100']
+PERCENTILES = [5, 25, 50, 75, 95]
+
+def load_inputs(input_file):
+	# Return {'name': value} as written in the input file, where value is a
+	# number, a distribution or a list of them.
+	inputs = yaml.load(open(input_file), yaml.Loader)
+	for v in inputs.values():
+		distributions.point_value(v)
+	return inputs
+
+def evaluate(task):
+	# Return an array of shape (len(specs), n), nan where conditions are
+	# false.
+	consts_file, filing_status, inputs, specs, n, seed = task
+	kernel = get_kernel(consts_file, filing_status,
+						tuple(plot.curve_names(specs)))
+	rng = numpy.random.default_rng(seed)
+	columns = {k: distributions.sample(v, rng, n) for k, v in inputs.items()}
+	ys = plot.combine(kernel(columns), specs)
+	return numpy.array([ys[i] for i in specs])
+
+def simulate(consts_file, filing_status, inputs, specs, samples,
+			 batch_size=1 << 17, seed=0, jobs=1):
+	# Return an array of shape (len(specs), samples).
+	seeds = numpy.random.SeedSequence(seed).spawn(
+		(samples + batch_size - 1) // batch_size)
+	tasks = [(consts_file, filing_status, inputs, specs,
+			  min(batch_size, samples - k * batch_size), s)
+			 for k, s in enumerate(seeds)]
+	if jobs <= 1 or len(tasks) <= 1:
+		results = list(map(evaluate, tasks))
+	else:
+		with multiprocessing.Pool(min(jobs, len(tasks))) as pool:
+			results = pool.map(evaluate, tasks)
+	return numpy.concatenate(results, axis=1)
+
+def summarize(values, percentiles):
+	# Return rows of the summary table for an array from simulate. Undefined
+	# samples are counted, and excluded from mean and percentiles.
+	ans = []
+	for y in values:
+		y_defined = y[~numpy.isnan(y)]
+		if len(y_defined):
+			stats = [y_defined.mean()] + list(
+				numpy.percentile(y_defined, percentiles))
+		else:
+			stats = [None] * (len(percentiles) + 1)
+		ans.append(['undefined' if i is None else '%.2f' % i for i in stats] +
+				   ['%d' % (len(y) - len(y_defined))])
+	return ans
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument('-f', '--filing-status', default='single')
+	parser.add_argument('-c', '--consts-file', default='consts/2024.yml')
+	parser.add_argument('-i', '--input-file', default='input.yml')
+	parser.add_argument('-n', '--samples', type=int, default=1000000)
+	parser.add_argument('--batch-size', type=int, default=1 << 17,
+						help='number of samples evaluated at once')
+	parser.add_argument('--seed', type=int, default=0)
+	parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+						help='number of worker processes')
+	parser.add_argument('--outputs', default=','.join(LINES),
+						help='comma-separated curves as in --plot of main.py '
+						'(default: %(default)s)')
+	parser.add_argument('--percentiles',
+						default=','.join(map(str, PERCENTILES)),
+						help='comma-separated (default: %(default)s)')
+	args = parser.parse_args()
+	if args.samples < 1 or args.batch_size < 1:
+		parser.error('Number of samples and batch size must be positive')
+
+	try:
+		inputs = load_inputs(args.input_file)
+	except ValueError as err:
+		parser.error(str(err))
+	specs = args.outputs.split(',')
+	try:
+		get_kernel(args.consts_file, args.filing_status,
+				   tuple(plot.curve_names(specs)))
+	except ValueError as err:
+		parser.error(str(err))
+	percentiles = list(map(float, args.percentiles.split(',')))
+	values = simulate(args.consts_file, args.filing_status, inputs, specs,
+					  args.samples, args.batch_size, args.seed, args.jobs)
+	rows = [['line', 'mean'] + ['p%g' % i for i in percentiles] +
+			['undefined']]
+	for spec, row in zip(specs, summarize(values, percentiles)):
+		rows.append([spec] + row)
+	for line in format_table(rows):
+		print(line)
+
+if __name__ == '__main__':
+	main()
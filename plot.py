@@ -0,0 +1,79 @@
+#	sympy-tax - Using sympy to compute tax as an equation
+#	Copyright (C) 2024  lxylxy123456
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Plot equations by sampling one input with the NumPy kernel. Points where a
+# condition is false are not plotted.
+
+import numpy
+
+from kernel import build_kernel
+
+def parse_curve(spec):
+	# Parse "a+b/c+d" to (['a', 'b'], ['c', 'd']), or "a+b" to (['a', 'b'],
+	# None).
+	num, _, den = spec.partition('/')
+	return num.split('+'), den.split('+') if den else None
+
+def curve_names(specs):
+	ans = []
+	for spec in specs:
+		num, den = parse_curve(spec)
+		for i in num + (den or []):
+			if i not in ans:
+				ans.append(i)
+	return ans
+
+def combine(result, specs):
+	# result is returned by a kernel. Return {spec: y}, where y is nan where
+	# conditions are false.
+	def total(names):
+		value = sum(result[i][0] for i in names)
+		mask = numpy.logical_and.reduce([result[i][1] for i in names])
+		return value, mask
+	ans = {}
+	for spec in specs:
+		num, den = parse_curve(spec)
+		y, mask = total(num)
+		if den is not None:
+			d, d_mask = total(den)
+			mask = mask & d_mask & (d != 0)
+			y = y / numpy.where(mask, d, 1)
+		ans[spec] = numpy.where(mask, y, numpy.nan)
+	return ans
+
+def sample(kernel, inputs, x_name, lo, hi, n, specs):
+	# Return x and {spec: y}.
+	x = numpy.linspace(lo, hi, n)
+	columns = {k: float(v) for k, v in inputs.items()}
+	columns[x_name] = x
+	return x, combine(kernel(columns), specs)
+
+def show(x_name, x, ys):
+	# ys is {label: y}.
+	import matplotlib.pyplot as plt
+	for label, y in ys.items():
+		plt.plot(x, y, label=label)
+	plt.xlabel(x_name)
+	plt.legend()
+	plt.grid(True)
+	plt.show()
+
+def plot(file_name, f_filing_status, c_filing_status, inputs, x_name, lo, hi,
+		 n, specs):
+	kernel = build_kernel(file_name, f_filing_status, c_filing_status,
+						  curve_names(specs))
+	x, ys = sample(kernel, inputs, x_name, lo, hi, n, specs)
+	show(x_name, x, ys)
@@ -0,0 +1,502 @@
+#	sympy-tax - Using sympy to compute tax as an equation
+#	Copyright (C) 2024  lxylxy123456
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Piecewise linear functions of one variable. When exactly one input is
+# variable, every equation is such a function, so this replaces sympy
+# Piecewise with sorted breakpoints.
+
+import bisect, fractions, functools, math, operator
+
+import numpy
+import sympy
+
+class PiecewiseLinear:
+	# xs is the sorted list of n breakpoints. On the open interval between
+	# xs[i - 1] and xs[i] (xs[-1] is -inf and xs[n] is inf), the value is
+	# slopes[i] * x + intercepts[i]. At xs[i] the value is points[i], so the
+	# function may be discontinuous at breakpoints. Conditions are represented
+	# as functions whose values are 0 (false) and 1 (true).
+	def __init__(self, xs, slopes, intercepts, points):
+		assert len(slopes) == len(intercepts) == len(xs) + 1
+		assert len(points) == len(xs)
+		self.xs = list(xs)
+		self.slopes = list(slopes)
+		self.intercepts = list(intercepts)
+		self.points = list(points)
+
+	@classmethod
+	def constant(cls, c):
+		return cls([], [0], [c], [])
+
+	@classmethod
+	def identity(cls):
+		return cls([], [1], [0], [])
+
+	def __repr__(self):
+		# e.g. "(-inf, 100]: 0; [100, inf): 0.5*x - 50"
+		ans = []
+		for k, (lo, hi, s, i) in enumerate(self.segments()):
+			left = '('
+			if k and _close(self.points[k - 1], s * lo + i):
+				left = '['
+			right = ')'
+			if k < len(self.xs) and _close(self.points[k], s * hi + i):
+				right = ']'
+			ans.append('%s%s, %s%s: %s' % (left, _format_number(lo),
+										   _format_number(hi), right,
+										   format_line(s, i)))
+			# A point that is on neither of the adjacent segments.
+			if (right == ')' and k < len(self.xs) and
+				not _close(self.points[k], self.line_value(k + 1, hi))):
+				ans.append('%s: %s' % (_format_number(hi),
+									   _format_number(self.points[k])))
+		return '; '.join(ans)
+
+	def line_value(self, i, x):
+		return self.slopes[i] * x + self.intercepts[i]
+
+	def __call__(self, x):
+		i = bisect.bisect_left(self.xs, x)
+		if i < len(self.xs) and self.xs[i] == x:
+			return self.points[i]
+		return self.line_value(i, x)
+
+	def evaluate(self, x):
+		# Vectorized evaluation of an array using binary search.
+		x = numpy.asarray(x, dtype=float)
+		xs = numpy.array(self.xs, dtype=float)
+		i = numpy.searchsorted(xs, x)
+		ans = (numpy.array(self.slopes, dtype=float)[i] * x +
+			   numpy.array(self.intercepts, dtype=float)[i])
+		if len(xs):
+			j = numpy.minimum(i, len(xs) - 1)
+			hit = xs[j] == x
+			ans = numpy.where(hit, numpy.array(self.points, dtype=float)[j],
+							  ans)
+		return ans
+
+	def refine(self, xs):
+		# Return the same function with breakpoints xs, which must be a sorted
+		# superset of self.xs.
+		slopes = []
+		intercepts = []
+		for k in range(len(xs) + 1):
+			j = bisect.bisect_right(self.xs, xs[k - 1]) if k else 0
+			slopes.append(self.slopes[j])
+			intercepts.append(self.intercepts[j])
+		points = list(map(self, xs))
+		return PiecewiseLinear(xs, slopes, intercepts, points)
+
+	def simplify(self):
+		# Remove breakpoints where the function is linear.
+		xs, slopes, intercepts, points = [], [self.slopes[0]], \
+			[self.intercepts[0]], []
+		for k, x in enumerate(self.xs):
+			s, i = self.slopes[k + 1], self.intercepts[k + 1]
+			if (_close(s, slopes[-1]) and _close(i, intercepts[-1]) and
+				_close(self.points[k], s * x + i)):
+				continue
+			xs.append(x)
+			points.append(self.points[k])
+			slopes.append(s)
+			intercepts.append(i)
+		return PiecewiseLinear(xs, slopes, intercepts, points)
+
+	def derivative(self):
+		# Return the slope as a step function. At a breakpoint the slope on the
+		# right is used, i.e. the rate of the next unit.
+		return PiecewiseLinear(self.xs, [0] * len(self.slopes), self.slopes,
+							   self.slopes[1:]).simplify()
+
+	def segments(self):
+		# Yield (lo, hi, slope, intercept) for each open interval.
+		bounds = [-math.inf] + self.xs + [math.inf]
+		for k in range(len(self.slopes)):
+			yield bounds[k], bounds[k + 1], self.slopes[k], self.intercepts[k]
+
+	def __add__(self, other):
+		return _binary(self, other, operator.add)
+
+	def __radd__(self, other):
+		return _binary(self, other, operator.add)
+
+	def __sub__(self, other):
+		return _binary(self, other, operator.sub)
+
+	def __rsub__(self, other):
+		return _binary(other, self, operator.sub)
+
+	def __neg__(self):
+		return self * -1
+
+	def __mul__(self, c):
+		# Only scaling by a constant keeps the function linear.
+		assert not isinstance(c, PiecewiseLinear)
+		return PiecewiseLinear(self.xs, [s * c for s in self.slopes],
+							   [i * c for i in self.intercepts],
+							   [p * c for p in self.points])
+
+	def __rmul__(self, c):
+		return self * c
+
+def format_condition(c):
+	# Format a condition as the intervals where it is true, e.g.
+	# "[1, 2) | 3". Return True if it is always true.
+	if not c.xs and c.intercepts[0]:
+		return True
+	# Walk segment 0, point 0, segment 1, ..., point n - 1, segment n.
+	items = []
+	for k, (lo, hi, s, i) in enumerate(c.segments()):
+		items.append((bool(i), '(', lo, hi, ')'))
+		if k < len(c.xs):
+			items.append((bool(c.points[k]), '[', c.xs[k], c.xs[k], ']'))
+	ans = []
+	start = None
+	for k, item in enumerate(items + [(False,)]):
+		if item[0] and start is None:
+			start = item
+		if not item[0] and start is not None:
+			end = items[k - 1]
+			if start is end and start[1] == '[':
+				ans.append(_format_number(start[2]))
+			else:
+				ans.append('%s%s, %s%s' % (start[1], _format_number(start[2]),
+										   _format_number(end[3]), end[4]))
+			start = None
+	return ' | '.join(ans) or 'False'
+
+def _close(a, b):
+	# nan is close to nan, so undefined segments are merged.
+	if math.isnan(a) and math.isnan(b):
+		return True
+	return math.isclose(a, b, rel_tol=1e-12, abs_tol=1e-9)
+
+def _format_number(x):
+	if isinstance(x, float) and math.isnan(x):
+		return 'undefined'
+	if isinstance(x, (float, fractions.Fraction)) and math.isfinite(x):
+		if x == int(x):
+			return '%d' % x
+		# Round to the precision of sympy Float.
+		return '%.15g' % x
+	return str(x)
+
+def format_line(slope, intercept):
+	if slope == 0:
+		return _format_number(intercept)
+	ans = 'x' if slope == 1 else '%s*x' % _format_number(slope)
+	if intercept > 0:
+		ans += ' + %s' % _format_number(intercept)
+	elif intercept < 0:
+		ans += ' - %s' % _format_number(-intercept)
+	return ans
+
+def _as_pwl(f):
+	if isinstance(f, PiecewiseLinear):
+		return f
+	return PiecewiseLinear.constant(f)
+
+def _representative(lo, hi):
+	# Return a point inside the open interval (lo, hi).
+	if math.isinf(lo) and math.isinf(hi):
+		return 0
+	if math.isinf(lo):
+		return hi - 1
+	if math.isinf(hi):
+		return lo + 1
+	return (lo + hi) / 2
+
+def _merge(*fs, extra=()):
+	xs = sorted(set(extra).union(*(f.xs for f in fs)))
+	return xs, [f.refine(xs) for f in fs]
+
+def _binary(a, b, op):
+	# Apply a linear operation on two functions.
+	xs, (a, b) = _merge(_as_pwl(a), _as_pwl(b))
+	return PiecewiseLinear(xs, list(map(op, a.slopes, b.slopes)),
+						   list(map(op, a.intercepts, b.intercepts)),
+						   list(map(op, a.points, b.points)))
+
+def _roots(f):
+	# Return x where some segment of f crosses 0.
+	ans = []
+	for lo, hi, s, i in f.segments():
+		if s != 0 and lo < -i / s < hi:
+			ans.append(-i / s)
+	return ans
+
+def _extremum(a, b, choose):
+	a, b = _as_pwl(a), _as_pwl(b)
+	xs, (a, b) = _merge(a, b, extra=_roots(a - b))
+	slopes, intercepts = [], []
+	for (lo, hi, sa, ia), (_, _, sb, ib) in zip(a.segments(), b.segments()):
+		m = _representative(lo, hi)
+		if choose(sa * m + ia, sb * m + ib) == sa * m + ia:
+			slopes.append(sa)
+			intercepts.append(ia)
+		else:
+			slopes.append(sb)
+			intercepts.append(ib)
+	points = list(map(choose, a.points, b.points))
+	return PiecewiseLinear(xs, slopes, intercepts, points).simplify()
+
+def maximum(*fs):
+	return functools.reduce(lambda a, b: _extremum(a, b, max), fs)
+
+def minimum(*fs):
+	return functools.reduce(lambda a, b: _extremum(a, b, min), fs)
+
+def compare(op, a, b):
+	# Return the condition op(a, b), e.g. compare(operator.ge, a, b).
+	h = _as_pwl(a) - _as_pwl(b)
+	xs, (h,) = _merge(h, extra=_roots(h))
+	intercepts = []
+	for lo, hi, s, i in h.segments():
+		intercepts.append(int(op(s * _representative(lo, hi) + i, 0)))
+	points = [int(op(p, 0)) for p in h.points]
+	return PiecewiseLinear(xs, [0] * len(intercepts), intercepts,
+						   points).simplify()
+
+def logical_and(*fs):
+	return minimum(*fs)
+
+def logical_or(*fs):
+	return maximum(*fs)
+
+def logical_not(f):
+	return 1 - _as_pwl(f)
+
+def logical_xor(*fs):
+	return functools.reduce(lambda a, b: compare(operator.ne, a, b), fs)
+
+def select(pairs, default=math.nan):
+	# Piecewise: pairs is [(value, condition)], the first true condition wins.
+	pairs = [(_as_pwl(v), _as_pwl(c)) for v, c in pairs]
+	xs, fs = _merge(*(f for p in pairs for f in p))
+	values, conds = fs[0::2], fs[1::2]
+	slopes, intercepts, points = [], [], []
+	for k in range(len(xs) + 1):
+		for v, c in zip(values, conds):
+			if c.intercepts[k]:
+				slopes.append(v.slopes[k])
+				intercepts.append(v.intercepts[k])
+				break
+		else:
+			slopes.append(0)
+			intercepts.append(default)
+	for k in range(len(xs)):
+		for v, c in zip(values, conds):
+			if c.points[k]:
+				points.append(v.points[k])
+				break
+		else:
+			points.append(default)
+	return PiecewiseLinear(xs, slopes, intercepts, points).simplify()
+
+def compose(f, g):
+	# Return f(g(x)).
+	f, g = _as_pwl(f), _as_pwl(g)
+	extra = []
+	for lo, hi, s, i in g.segments():
+		if s != 0:
+			extra.extend(r for r in ((b - i) / s for b in f.xs) if lo < r < hi)
+	xs, (g,) = _merge(g, extra=extra)
+	slopes, intercepts = [], []
+	for lo, hi, s, i in g.segments():
+		y = s * _representative(lo, hi) + i
+		j = bisect.bisect_left(f.xs, y)
+		if s == 0 and j < len(f.xs) and f.xs[j] == y:
+			slopes.append(0)
+			intercepts.append(f.points[j])
+		else:
+			slopes.append(f.slopes[j] * s)
+			intercepts.append(f.slopes[j] * i + f.intercepts[j])
+	points = list(map(f, g.points))
+	return PiecewiseLinear(xs, slopes, intercepts, points).simplify()
+
+def _number(x):
+	# Use exact arithmetic, so breakpoints are not affected by rounding. Floats
+	# in this project are decimal numbers like 0.22.
+	if x.is_Integer:
+		return int(x)
+	if x.is_Rational:
+		return fractions.Fraction(int(x.p), int(x.q))
+	return fractions.Fraction(str(x))
+
+_relationals = {
+	sympy.GreaterThan: operator.ge,
+	sympy.StrictGreaterThan: operator.gt,
+	sympy.LessThan: operator.le,
+	sympy.StrictLessThan: operator.lt,
+	sympy.Equality: operator.eq,
+	sympy.Unequality: operator.ne,
+}
+
+def from_expr(expr, env):
+	# Convert a sympy expression or condition to PiecewiseLinear, where env is
+	# {symbol: PiecewiseLinear} for all free symbols. Raise ValueError if the
+	# expression is not piecewise linear.
+	convert = lambda x: from_expr(x, env)
+	if expr.is_Symbol:
+		return env[expr]
+	if expr.is_Number:
+		return PiecewiseLinear.constant(_number(expr))
+	if expr == True:
+		return PiecewiseLinear.constant(1)
+	if expr == False:
+		return PiecewiseLinear.constant(0)
+	if isinstance(expr, sympy.Add):
+		return functools.reduce(operator.add, map(convert, expr.args))
+	if isinstance(expr, sympy.Mul):
+		ans = PiecewiseLinear.constant(1)
+		for i in expr.args:
+			if i.is_Number:
+				ans *= _number(i)
+			elif ans.xs or any(ans.slopes):
+				raise ValueError('Not linear: %s' % expr)
+			else:
+				ans = convert(i) * ans.intercepts[0]
+		return ans
+	if isinstance(expr, sympy.Max):
+		return maximum(*map(convert, expr.args))
+	if isinstance(expr, sympy.Min):
+		return minimum(*map(convert, expr.args))
+	if isinstance(expr, sympy.Piecewise):
+		return select([(convert(v), convert(c)) for v, c in expr.args])
+	if type(expr) in _relationals:
+		return compare(_relationals[type(expr)], *map(convert, expr.args))
+	if isinstance(expr, sympy.And):
+		return logical_and(*map(convert, expr.args))
+	if isinstance(expr, sympy.Or):
+		return logical_or(*map(convert, expr.args))
+	if isinstance(expr, sympy.Not):
+		return logical_not(convert(expr.args[0]))
+	if isinstance(expr, sympy.Xor):
+		return logical_xor(*map(convert, expr.args))
+	raise ValueError('Not piecewise linear: %s' % expr)
+
+def compute_lines(e, inputs, variable_input, names=None):
+	# Compute equations of a model built with keep_references as functions of
+	# one variable input, with other inputs fixed. Return {'name': (value,
+	# condition)} as PiecewiseLinear.
+	reduced = e.reduce(inputs, {variable_input}, names)
+	env = {sympy.Symbol(variable_input): PiecewiseLinear.identity()}
+	result = {}
+	for i, (v, c) in reduced.items():
+		rv, rc = e.references[i]
+		result[i] = env[rv], env[rc] = from_expr(v, env), from_expr(c, env)
+	return result
+
+def _spec_names(specs):
+	names = []
+	for spec in specs:
+		names.extend(i for i in spec.split('+') if i not in names)
+	return names
+
+def _sum_lines(lines, spec):
+	# Return the value and condition of a sum of equations.
+	parts = spec.split('+')
+	value = functools.reduce(operator.add, (lines[i][0] for i in parts))
+	condition = logical_and(*(lines[i][1] for i in parts))
+	return value, condition
+
+def marginal_rates(e, inputs, variable_input, specs):
+	# specs is a list of sums of equations, e.g. ['v_f1040_24+v_ca540_64'].
+	# Return {spec: PiecewiseLinear} as the derivative of each sum with respect
+	# to the variable input. The value is nan where a condition is false.
+	lines = compute_lines(e, inputs, variable_input, _spec_names(specs))
+	ans = {}
+	for spec in specs:
+		value, condition = _sum_lines(lines, spec)
+		ans[spec] = select([(value.derivative(), condition)])
+	return ans
+
+def solve(f, target, lo=-math.inf, hi=math.inf):
+	# Return the smallest x in [lo, hi] where f reaches target, or None. f
+	# reaches target where it or its limit from either side equals target, or
+	# where it jumps over target at a breakpoint. So if f equals target on an
+	# interval, its left end is returned, or its right end if the interval is
+	# unbounded on the left (None if f equals target everywhere). Undefined
+	# (nan) values never reach target.
+	h = f - target
+	for k, (a, b, s, i) in enumerate(h.segments()):
+		a, b = max(a, lo), min(b, hi)
+		if a <= b:
+			if s == 0 and i == 0:
+				if math.isfinite(a):
+					return a
+				return b if math.isfinite(b) else None
+			if s != 0 and a <= -i / s <= b:
+				return -i / s
+		if k == len(h.xs):
+			break
+		x = h.xs[k]
+		if x < lo:
+			continue
+		if x > hi:
+			break
+		left, right = h.line_value(k, x), h.line_value(k + 1, x)
+		if 0 in (left, h.points[k], right) or left * right < 0 or \
+			left * h.points[k] < 0:
+			return x
+	return None
+
+def breakpoints(f, lo=-math.inf, hi=math.inf):
+	# Yield (x, kind, left, point, right) for each breakpoint of f in [lo, hi].
+	# kind is 'kink' or 'cliff' (a discontinuity, including where f becomes
+	# undefined). left and right are (slope, limit) on each side, and point is
+	# f(x). Slopes of undefined segments are nan.
+	f = f.simplify()
+	for k, x in enumerate(f.xs):
+		if not lo <= x <= hi:
+			continue
+		sides = []
+		for j in (k, k + 1):
+			v = f.line_value(j, x)
+			sides.append((math.nan if math.isnan(v) else f.slopes[j], v))
+		left, right = sides
+		p = f.points[k]
+		kind = 'kink'
+		if not (_close(left[1], p) and _close(right[1], p)):
+			kind = 'cliff'
+		yield x, kind, left, p, right
+
+def format_breakpoint(x, kind, left, point, right):
+	# e.g. "109105: kink, slope 0.22 | 0.24, value 100 | 100 | 100"
+	return '%s: %s, slope %s | %s, value %s | %s | %s' % (
+		_format_number(x), kind, _format_number(left[0]),
+		_format_number(right[0]), _format_number(left[1]),
+		_format_number(point), _format_number(right[1]))
+
+def line_breakpoints(e, inputs, variable_input, specs, lo=-math.inf,
+					 hi=math.inf):
+	# Return {spec: [(x, kind, left, point, right)]} for sums of equations.
+	lines = compute_lines(e, inputs, variable_input, _spec_names(specs))
+	ans = {}
+	for spec in specs:
+		f = select([_sum_lines(lines, spec)])
+		ans[spec] = list(breakpoints(f, lo, hi))
+	return ans
+
+def goal_seek(e, inputs, variable_input, goals, lo=-math.inf, hi=math.inf):
+	# goals is a list of (spec, target), where spec is a sum of equations and
+	# target is a sympy number.
+	# Return a list of x for each goal, where x is the smallest value of the
+	# variable input in [lo, hi] that makes spec reach target, or None.
+	lines = compute_lines(e, inputs, variable_input,
+						  _spec_names(spec for spec, _ in goals))
+	return [solve(select([_sum_lines(lines, spec)]), _number(target), lo, hi)
+			for spec, target in goals]
@@ -0,0 +1,360 @@
+#	sympy-tax - Using sympy to compute tax as an equation
+#	Copyright (C) 2024  lxylxy123456
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Split the domain of variable inputs into regions where a condition is
+# decided. Relational atoms are decided with interval arithmetic over a box of
+# input ranges when possible, and only the remaining atoms are split on.
+
+import math
+
+import sympy
+from sympy.core.relational import Relational
+
+import pwl
+
+# A box is {symbol: (lo, hi)}, closed intervals. Symbols not in the box are
+# unbounded. decompose also keeps (lo, hi, lo_open, hi_open) in boxes, so
+# excluded end points are not split again.
+UNBOUNDED = (-math.inf, math.inf)
+
+def _mul(a, b):
+	# 0 * inf is 0 here, because one side is exactly 0.
+	ps = [0 if x == 0 or y == 0 else x * y for x in a for y in b]
+	return min(ps), max(ps)
+
+def interval(expr, box, memo=None):
+	# Return (lo, hi) that bounds expr for all points in box.
+	if memo is None:
+		memo = {}
+	if expr in memo:
+		return memo[expr]
+	if expr.is_Number:
+		ans = (float(expr), float(expr))
+	elif expr.is_Symbol:
+		ans = box.get(expr, UNBOUNDED)[:2]
+	elif isinstance(expr, sympy.Add):
+		ivs = [interval(i, box, memo) for i in expr.args]
+		ans = (sum(i[0] for i in ivs), sum(i[1] for i in ivs))
+	elif isinstance(expr, sympy.Mul):
+		ans = (1, 1)
+		for i in expr.args:
+			ans = _mul(ans, interval(i, box, memo))
+	elif isinstance(expr, (sympy.Max, sympy.Min)):
+		ivs = [interval(i, box, memo) for i in expr.args]
+		choose = max if isinstance(expr, sympy.Max) else min
+		ans = (choose(i[0] for i in ivs), choose(i[1] for i in ivs))
+	elif isinstance(expr, sympy.Piecewise):
+		# Hull of the branches that may be taken.
+		ivs = []
+		for v, c in expr.args:
+			d = decide(c, box, memo)
+			if d is False:
+				continue
+			ivs.append(interval(v, box, memo))
+			if d is True:
+				break
+		if not ivs:
+			ans = (math.nan, math.nan)
+		else:
+			ans = (min(i[0] for i in ivs), max(i[1] for i in ivs))
+	else:
+		ans = UNBOUNDED
+	memo[expr] = ans
+	return ans
+
+def decide(cond, box, memo=None):
+	# Return True or False if cond has the same value for all points in box,
+	# else None. memo is shared with interval, and may be initialized with
+	# {relational: bool} for relationals known to be true or false.
+	if memo is None:
+		memo = {}
+	if cond == True or cond == False:
+		return bool(cond)
+	if cond in memo:
+		return memo[cond]
+	ans = memo[cond] = _decide(cond, box, memo)
+	return ans
+
+def _decide(cond, box, memo):
+	if isinstance(cond, Relational):
+		lo1, hi1 = interval(cond.lhs, box, memo)
+		lo2, hi2 = interval(cond.rhs, box, memo)
+		# Bounds of lhs - rhs.
+		lo, hi = lo1 - hi2, hi1 - lo2
+		if math.isnan(lo) or math.isnan(hi):
+			return None
+		if isinstance(cond, (sympy.GreaterThan, sympy.StrictGreaterThan)):
+			lo, hi = -hi, -lo
+		elif isinstance(cond, (sympy.Equality, sympy.Unequality)):
+			if lo == hi == 0:
+				return isinstance(cond, sympy.Equality)
+			if lo > 0 or hi < 0:
+				return isinstance(cond, sympy.Unequality)
+			return None
+		# Now cond is lhs - rhs < 0 or <= 0, negated for > and >=.
+		strict = isinstance(cond, (sympy.StrictLessThan,
+								   sympy.StrictGreaterThan))
+		if hi < 0 or (hi == 0 and not strict):
+			return True
+		if lo > 0 or (lo == 0 and strict):
+			return False
+		return None
+	ds = [decide(i, box, memo) for i in cond.args]
+	if isinstance(cond, sympy.And):
+		if False in ds:
+			return False
+		return True if all(d is True for d in ds) else None
+	if isinstance(cond, sympy.Or):
+		if True in ds:
+			return True
+		return False if all(d is False for d in ds) else None
+	if None in ds:
+		return None
+	if isinstance(cond, sympy.Not):
+		return not ds[0]
+	if isinstance(cond, sympy.Xor):
+		return sum(ds) % 2 == 1
+	return None
+
+def _dominated(ivs, k, choose):
+	# Whether argument k of Max (choose is max) or Min (min) never changes the
+	# result, given intervals of the arguments.
+	lo, hi = ivs[k]
+	for j, (lo2, hi2) in enumerate(ivs):
+		if j != k and (hi <= lo2 if choose is max else lo >= hi2):
+			return True
+	return False
+
+def prune(expr, box, memo, imemo):
+	# Return expr without branches of Piecewise, Max and Min that cannot be
+	# taken for points in box, and with decided conditions replaced by True or
+	# False. memo is {expr: pruned expr} and imemo is the memo of interval.
+	# Both can be reused for the same box.
+	if expr.is_Atom:
+		return expr
+	if expr in memo:
+		return memo[expr]
+	ans = None
+	if isinstance(expr, sympy.logic.boolalg.Boolean):
+		d = decide(expr, box, imemo)
+		if d is not None:
+			ans = sympy.true if d else sympy.false
+	if ans is not None:
+		pass
+	elif isinstance(expr, sympy.Piecewise):
+		args = []
+		for v, c in expr.args:
+			c = prune(c, box, memo, imemo)
+			if c == False:
+				continue
+			args.append((prune(v, box, memo, imemo), c))
+			if c == True:
+				break
+		if not args:
+			ans = expr
+		elif args[0][1] == True:
+			ans = args[0][0]
+		else:
+			ans = sympy.Piecewise(*args)
+	elif isinstance(expr, (sympy.Max, sympy.Min)):
+		args = [prune(i, box, memo, imemo) for i in expr.args]
+		choose = max if isinstance(expr, sympy.Max) else min
+		# Remove dominated arguments one at a time, so equal ones are kept.
+		k = 0
+		while k < len(args) and len(args) > 1:
+			ivs = [interval(i, box, imemo) for i in args]
+			if _dominated(ivs, k, choose):
+				del args[k]
+			else:
+				k += 1
+		ans = expr.func(*args) if args != list(expr.args) else expr
+	else:
+		args = [prune(i, box, memo, imemo) for i in expr.args]
+		ans = expr.func(*args) if args != list(expr.args) else expr
+	memo[expr] = ans
+	return ans
+
+def _truth(rel, truth):
+	# Return where rel is truth as PiecewiseLinear of its only symbol, or None
+	# if rel is not a piecewise linear relational of one symbol.
+	if len(rel.free_symbols) != 1:
+		return None
+	x, = rel.free_symbols
+	try:
+		f = pwl.from_expr(rel, {x: pwl.PiecewiseLinear.identity()})
+	except ValueError:
+		return None
+	return f if truth else pwl.logical_not(f)
+
+def tighten(box, x, f):
+	# Intersect box with where f (a condition of x as PiecewiseLinear) is
+	# true. Return (new box, exact), or (None, True) if it is empty. exact is
+	# False if f is false somewhere inside the new range of x.
+	lo, hi, lo_open, hi_open = box.get(x, UNBOUNDED + (True, True))
+	# Pieces (start, end, start is included, end is included, value) of f in
+	# the range of x, in order.
+	pieces = []
+	for k, (a, b, _, i) in enumerate(f.segments()):
+		start, end = max(a, lo), min(b, hi)
+		if start < end:
+			pieces.append((start, end, a < lo and not lo_open,
+						   b > hi and not hi_open, i))
+		elif start == end and a < start < b:
+			pieces.append((start, end, True, True, i))
+		if k < len(f.xs):
+			p = f.xs[k]
+			if lo < p < hi or (p == lo and not lo_open) or \
+				(p == hi and not hi_open):
+				pieces.append((p, p, True, True, f.points[k]))
+	true = [k for k, p in enumerate(pieces) if p[4]]
+	if not true:
+		return None, True
+	exact = all(p[4] for p in pieces[true[0]:true[-1] + 1])
+	first, last = pieces[true[0]], pieces[true[-1]]
+	new = (first[0], last[1], not first[2], not last[3])
+	if new == (lo, hi, lo_open, hi_open):
+		return box, exact
+	return {**box, x: new}, exact
+
+def _live_atoms(expr, box, memo, ans, seen):
+	# Append undecided relationals that may change the value of expr to ans,
+	# inner relationals first. Branches of Piecewise that cannot be taken are
+	# skipped.
+	if expr.is_Atom or expr in seen:
+		return
+	seen.add(expr)
+	if isinstance(expr, Relational):
+		if decide(expr, box, memo) is None:
+			for i in expr.args:
+				_live_atoms(i, box, memo, ans, seen)
+			ans.append(expr)
+		return
+	if isinstance(expr, sympy.Piecewise):
+		for v, c in expr.args:
+			d = decide(c, box, memo)
+			if d is False:
+				continue
+			if d is None:
+				_live_atoms(c, box, memo, ans, seen)
+			_live_atoms(v, box, memo, ans, seen)
+			if d is True:
+				break
+		return
+	if isinstance(expr, sympy.logic.boolalg.Boolean):
+		if decide(expr, box, memo) is not None:
+			return
+	for i in expr.args:
+		_live_atoms(i, box, memo, ans, seen)
+
+def _assume(decided, rel, truth):
+	for r in (rel, rel.reversed):
+		decided[r] = truth
+		decided[r.negated] = not truth
+
+def _simplify(expr, box, memo):
+	# Replace relationals in expr that are decided.
+	decided = {}
+	for r in expr.atoms(Relational):
+		d = decide(r, box, memo)
+		if d is not None:
+			decided[r] = sympy.true if d else sympy.false
+	return expr.xreplace(decided)
+
+def decompose(value, condition, box, max_regions=1000):
+	# Return a list of (alternatives, value, condition) for regions that cover
+	# box. alternatives is a list of lists of strings, where the region is
+	# the union of the alternatives and the strings in each alternative hold
+	# together. condition is True or False, and value is simplified with the
+	# decided relationals. Regions are merged when they are both undefined or
+	# have the same value. Raise RuntimeError if there are more than
+	# max_regions regions before merging.
+	# Inputs of skipped forms can be plain Python numbers.
+	value, condition = sympy.sympify(value), sympy.sympify(condition)
+	ans = []
+	# {(value, condition): index in ans}
+	merged = {}
+	count = 0
+	# Stack of (constraints, box, decided). constraints is {key: str or
+	# relational}, where key is (symbol, 'lo' or 'hi') for bounds of the box,
+	# so only the tightest bound is kept. decided is {relational: bool} for the
+	# split relationals.
+	box = {x: (lo, hi, False, False) for x, (lo, hi) in box.items()}
+	stack = [({}, box, {})]
+	while stack:
+		constraints, box, decided = stack.pop()
+		memo = dict(decided)
+		c = decide(condition, box, memo)
+		if c is not None:
+			count += 1
+			if count > max_regions:
+				raise RuntimeError('Too many regions')
+			# Relationals are simplified with the decisions in the region.
+			cs = [i if isinstance(i, str) else
+				  str(i.func(*(_simplify(j, box, memo) for j in i.args)))
+				  for i in constraints.values()]
+			v = _simplify(value, box, memo) if c else None
+			if (v, c) in merged:
+				ans[merged[v, c]][0].append(cs)
+			else:
+				merged[v, c] = len(ans)
+				ans.append(([cs], v, c))
+			continue
+		atoms = []
+		_live_atoms(condition, box, memo, atoms, set())
+		if not atoms:
+			raise RuntimeError('Cannot evaluate condition')
+		r = atoms[0]
+		for truth in (False, True):
+			cs = dict(constraints)
+			f = _truth(r, truth)
+			b, exact = box, False
+			if f is not None:
+				x, = r.free_symbols
+				b, exact = tighten(box, x, f)
+				if b is None:
+					continue
+			if not exact:
+				rel = r if truth else r.negated
+				cs[rel] = rel
+			elif b is not box:
+				lo, hi, lo_open, hi_open = b[x]
+				if lo == hi:
+					cs[x, 'lo'] = '%s = %.15g' % (x, lo)
+					cs.pop((x, 'hi'), None)
+				else:
+					old = box.get(x)
+					if math.isfinite(lo) and (old is None or
+											  (lo, lo_open) != old[::2]):
+						cs[x, 'lo'] = '%s %s %.15g' % (x, '>' if lo_open
+													   else '>=', lo)
+					if math.isfinite(hi) and (old is None or
+											  (hi, hi_open) != old[1::2]):
+						cs[x, 'hi'] = '%s %s %.15g' % (x, '<' if hi_open
+													   else '<=', hi)
+			d = dict(decided)
+			_assume(d, r, truth)
+			stack.append((cs, b, d))
+	# The stack visits regions in reverse order.
+	ans.reverse()
+	for alternatives, _, _ in ans:
+		alternatives.reverse()
+	return ans
+
+def format_region(alternatives):
+	# e.g. "v_f1040_1a > 100 & v_f1040_1a <= 200 | v_f1040_1a > 300"
+	if [] in alternatives:
+		return 'True'
+	return ' | '.join(' & '.join(i) for i in alternatives)
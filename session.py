@@ -0,0 +1,62 @@
+#	sympy-tax - Using sympy to compute tax as an equation
+#	Copyright (C) 2024  lxylxy123456
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# What-if session: change inputs one at a time and only recompute the
+# equations downstream of the changed inputs.
+
+import sympy
+
+class Session:
+	def __init__(self, e, inputs):
+		# e must be built with keep_references.
+		assert e.keep_references
+		self.e = e
+		# Dict as {'name': symbol}, for inputs.
+		self.input_symbols = {str(sn): sn for sn in e.inputs}
+		# Dict as {symbol: value}, for inputs and references to equations.
+		self.values = {}
+		for name, sn in self.input_symbols.items():
+			self.values[sn] = sympy.core.numbers.Number(
+				inputs.get(name, e.inputs[sn]))
+		# Dict as {'name': (value, condition)}.
+		self.results = {}
+		# Set as {'name'}, for equations that need to be recomputed.
+		self.dirty = set(e.equations)
+		self.recompute()
+
+	def set_input(self, name, value):
+		sn = self.input_symbols[name]
+		value = sympy.core.numbers.Number(value)
+		if self.values[sn] == value:
+			return
+		self.values[sn] = value
+		self.dirty |= self.e.descendants([name])
+
+	def get_input(self, name):
+		return self.values[self.input_symbols[name]]
+
+	def recompute(self):
+		# Return names of recomputed equations, in definition order.
+		names = self.e.topological_order(self.dirty)
+		for i in names:
+			self.results[i] = self.e.evaluate_equation(i, self.values)
+		self.dirty = set()
+		return names
+
+	def get(self, name):
+		if self.dirty:
+			self.recompute()
+		return self.results[name]
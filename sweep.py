@@ -0,0 +1,88 @@
+#	sympy-tax - Using sympy to compute tax as an equation
+#	Copyright (C) 2024  lxylxy123456
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Compute one input file for several filing statuses and consts files. The
+# input file is parsed once, and each variant is built and computed in its own
+# worker process using the fast-start program. Results are printed side by
+# side.
+
+import argparse, multiprocessing, os
+
+from fast import format_number, get_inputs, load_program, run_program
+
+# Federal and CA tax, owe and refund.
+LINES = ['v_f1040_24', 'v_f1040_34', 'v_f1040_37', 'v_ca540_64',
+		 'v_ca540_100', 'v_ca540_115']
+
+def evaluate(task):
+	consts_file, filing_status, inputs, lines = task
+	program = load_program(consts_file, filing_status, filing_status)
+	result = run_program(program, inputs)
+	ans = []
+	for i in lines:
+		if i not in result:
+			raise ValueError('Unknown equation: %s' % i)
+		v, c = result[i]
+		ans.append(format_number(v if c else None))
+	return ans
+
+def format_table(rows):
+	widths = [max(map(len, col)) for col in zip(*rows)]
+	for row in rows:
+		yield '  '.join(s.ljust(w) if k == 0 else s.rjust(w)
+						for k, (s, w) in enumerate(zip(row, widths)))
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument('-f', '--filing-statuses',
+						default='single,mfj,hoh,mfs,qss',
+						help='comma-separated (default: %(default)s)')
+	parser.add_argument('-c', '--consts-files', default='consts/2024.yml',
+						help='comma-separated (default: %(default)s)')
+	parser.add_argument('-i', '--input-file', default='input.yml')
+	parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+						help='number of worker processes')
+	parser.add_argument('--outputs', default=','.join(LINES),
+						help='comma-separated equation names to print '
+						'(default: %(default)s)')
+	args = parser.parse_args()
+
+	inputs = get_inputs(args.input_file)
+	lines = args.outputs.split(',')
+	variants = [(c, f) for c in args.consts_files.split(',')
+				for f in args.filing_statuses.split(',')]
+	# Check the names with the first variant before starting the workers.
+	c, f = variants[0]
+	names = {i for i, _, _ in load_program(c, f, f)['equations']}
+	for i in lines:
+		if i not in names:
+			parser.error('Unknown equation: %s' % i)
+	tasks = [(c, f, inputs, lines) for c, f in variants]
+	if args.jobs <= 1 or len(tasks) <= 1:
+		columns = list(map(evaluate, tasks))
+	else:
+		with multiprocessing.Pool(min(args.jobs, len(tasks))) as pool:
+			columns = pool.map(evaluate, tasks)
+
+	rows = [['consts'] + [c for c, f in variants],
+			['filing status'] + [f for c, f in variants]]
+	for k, i in enumerate(lines):
+		rows.append([i] + [col[k] for col in columns])
+	for line in format_table(rows):
+		print(line)
+
+if __name__ == '__main__':
+	main()
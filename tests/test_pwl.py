@@ -0,0 +1,34 @@
+#	sympy-tax - Using sympy to compute tax as an equation
+#	Copyright (C) 2024  lxylxy123456
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pwl import PiecewiseLinear, solve
+
+def test_solve_bounds():
+	f = PiecewiseLinear.identity() * 2
+	assert solve(f, 10, 0, 5) == 5
+	assert solve(f, 10, 5, 9) == 5
+	assert solve(f, 10, 0, 4) is None
+
+def test_solve_flat():
+	# 0 up to 100, then x - 100.
+	f = PiecewiseLinear([100], [0, 1], [0, -100], [0])
+	assert solve(f, 0) == 100
+	assert solve(f, 0, 50) == 50
+	assert solve(PiecewiseLinear.constant(0), 0) is None
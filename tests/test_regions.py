@@ -0,0 +1,53 @@
+#	sympy-tax - Using sympy to compute tax as an equation
+#	Copyright (C) 2024  lxylxy123456
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os, subprocess, sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_main(*args, cache_dir=''):
+	env = dict(os.environ, SYMPY_TAX_CACHE=str(cache_dir))
+	return subprocess.run([sys.executable, 'main.py', *args], cwd=ROOT,
+						  env=env, capture_output=True, text=True, check=True)
+
+# v_ca540ca_II_29 reads inputs that are not in input.yml, which are plain
+# Python numbers in inline mode.
+@pytest.mark.parametrize('mode', [[], ['--by-line']])
+def test_regions(mode):
+	result = run_main('--variable-inputs', 'v_f1040_1a', '--regions',
+					  '--outputs', 'v_ca540ca_II_29,v_f1040_37', *mode)
+	lines = result.stdout.splitlines()
+	assert lines[0].startswith('v_ca540ca_II_29 = ')
+	assert any(i.startswith('v_f1040_37 = ') and i.endswith(' regions')
+			   for i in lines)
+
+def test_regions_cached_range(tmp_path):
+	# Options of an earlier run must not be restored from the model cache.
+	args = ['--by-line', '--regions', '--variable-inputs', 'v_f1040_1a',
+			'--outputs', 'v_f1040_37']
+	cold = run_main(*args).stdout
+	run_main(*args, '--input-range', 'v_f1040_1a=150000:300000',
+			 cache_dir=tmp_path)
+	assert run_main(*args, cache_dir=tmp_path).stdout == cold
+
+def test_input_range_outside():
+	# v_f1040_1a is 120000 in input.yml.
+	with pytest.raises(subprocess.CalledProcessError) as err:
+		run_main('--variable-inputs', 'v_f1040_1a', '--input-range',
+				 'v_f1040_1a=150000:300000', '--outputs', 'v_f1040_16')
+	assert 'v_f1040_1a = 120000 is outside' in err.value.stderr
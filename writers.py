@@ -0,0 +1,74 @@
+#	sympy-tax - Using sympy to compute tax as an equation
+#	Copyright (C) 2024  lxylxy123456
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Structured output. Each record is one equation of one input, written as soon
+# as it is computed, with fields:
+# * input: identifier of the input, e.g. the input file name.
+# * name: equation name.
+# * value: a number, an expression string if it depends on variable inputs,
+#   or empty if undefined.
+# * status: 'defined', 'undefined', or 'undecided' if the condition depends
+#   on variable inputs.
+
+import csv, json, math
+
+from fast import format_number
+
+FIELDS = ['input', 'name', 'value', 'status']
+
+def get_status(condition):
+	if condition == True:
+		return 'defined'
+	if condition == False:
+		return 'undefined'
+	return 'undecided'
+
+def get_value(value, condition):
+	# Return None if undefined, a float if value is a number, or a string.
+	if condition == False or value is None:
+		return None
+	try:
+		x = float(value)
+	except TypeError:
+		return str(value)
+	if math.isnan(x):
+		return None
+	return float(format_number(x))
+
+class JsonLinesWriter:
+	def __init__(self, f):
+		self.f = f
+
+	def write(self, input_id, name, value, condition):
+		record = [input_id, name, get_value(value, condition),
+				  get_status(condition)]
+		self.f.write(json.dumps(dict(zip(FIELDS, record))) + '\n')
+
+class CsvWriter:
+	def __init__(self, f):
+		self.writer = csv.writer(f)
+		self.writer.writerow(FIELDS)
+
+	def write(self, input_id, name, value, condition):
+		v = get_value(value, condition)
+		if type(v) == float:
+			v = format_number(v)
+		self.writer.writerow([input_id, name, v, get_status(condition)])
+
+WRITERS = {
+	'jsonl': JsonLinesWriter,
+	'csv': CsvWriter,
+}